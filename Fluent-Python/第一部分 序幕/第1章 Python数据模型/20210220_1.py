@@ -60,4 +60,510 @@ print(deck[12::13])
 #
 #
 # for card in sorted(deck, key=spades_high):
-#     print(card)
\ No newline at end of file
+#     print(card)
+
+# 紧凑编码的纸牌和多副牌的牌靴
+# FrenchDeck的每张牌都是一个Card对象，8副牌的牌靴就有416个对象，模拟中反复洗牌时，大部分时间花在移动对象引用上
+# CompactDeck把每张牌编码成一个小整数：rank * 4 + suit，正好等于这张牌在FrenchDeck中的位置，整副牌存放在bytearray里，每张牌只占一个字节
+# 只有通过索引取单张牌时才查表得到Card对象；切片返回新的CompactDeck，仍然支持len()、[]和迭代
+import random
+import timeit
+
+try:  # NumPy是可选依赖，用于整块洗牌
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class CompactDeck:
+    ranks = FrenchDeck.ranks
+    suits = FrenchDeck.suits
+    _cards = FrenchDeck()._cards  # 编码到Card的解码表，所有实例共用
+    _encoding = {card: code for code, card in enumerate(_cards)}
+
+    def __init__(self, decks=1):
+        self._codes = bytearray(range(len(self._cards))) * decks
+
+    @classmethod
+    def fromcodes(cls, codes):  # 从任意整数编码序列构建，不检查重复
+        deck = cls.__new__(cls)
+        deck._codes = bytearray(codes)
+        return deck
+
+    @classmethod
+    def encode(cls, card):
+        return cls._encoding[card]
+
+    @classmethod
+    def decode(cls, codes):  # 惰性地把编码转换成Card
+        cards = cls._cards
+        return (cards[code] for code in codes)
+
+    @property
+    def codes(self):  # 只读视图，不复制
+        return memoryview(self._codes).toreadonly()
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return CompactDeck.fromcodes(self._codes[position])
+        return self._cards[self._codes[position]]
+
+    def __iter__(self):
+        return self.decode(self._codes)
+
+    def __repr__(self):
+        return '{}.fromcodes({!r})'.format(type(self).__name__, bytes(self._codes))
+
+    def shuffle(self, rng=random):  # rng可以是random模块、random.Random实例或numpy.random.Generator
+        if numpy is not None and isinstance(rng, numpy.random.Generator):
+            rng.shuffle(numpy.frombuffer(self._codes, dtype=numpy.uint8))  # 直接在缓冲区上整块洗牌
+            return
+        rand = rng.random
+        codes = self._codes
+        for i in range(len(codes) - 1, 0, -1):  # Fisher–Yates洗牌，只交换字节
+            j = int(rand() * (i + 1))
+            codes[i], codes[j] = codes[j], codes[i]
+
+
+class Shoe(CompactDeck):
+    """ 赌场用的多副牌牌靴，从头到尾依次发牌 """
+
+    def __init__(self, decks=8):
+        super().__init__(decks)
+        self._position = 0
+
+    @property
+    def remaining(self):
+        return len(self._codes) - self._position
+
+    def shuffle(self, rng=random):  # 洗牌后从头开始发
+        super().shuffle(rng)
+        self._position = 0
+
+    def deal(self, n):  # 返回编码的只读视图，不创建Card对象；洗牌后视图的内容会改变，需要保留时用bytes()复制
+        if n < 0:  # 负数会让发牌位置后退，重复发出同样的牌
+            raise ValueError('cannot deal a negative number of cards: {}'.format(n))
+        if n > self.remaining:
+            raise IndexError('only {} cards left in the shoe'.format(self.remaining))
+        start = self._position
+        self._position += n
+        return self.codes[start:self._position]
+
+
+compact = CompactDeck()
+print(len(compact), compact[0], compact[-1])
+# 52 Card(rank='2', suit='spades') Card(rank='A', suit='hearts')
+print(all(a == b for a, b in zip(compact, deck)), compact.encode(beer_card), compact[compact.encode(beer_card)])
+# True 21 Card(rank='7', suit='diamonds')
+print(list(compact[12::13]) == deck[12::13])
+# True
+
+shoe = Shoe(8)
+shoe.shuffle(random.Random(42))
+hand = shoe.deal(5)
+print(len(shoe), shoe.remaining, list(hand) == list(shoe.codes[:5]))
+# 416 411 True
+print(sorted(CompactDeck.fromcodes(range(52)).codes) == sorted(set(shoe.codes)))  # 洗牌只改变顺序
+# True
+print(list(CompactDeck.decode(hand)) == list(shoe[:5]))
+# True
+
+# 与Card对象列表的洗牌速度对比
+cards = [card for _ in range(8) for card in deck]
+rng = random.Random(0)
+print('list of Card: {:.3f}s'.format(timeit.timeit(lambda: rng.shuffle(cards), number=200)))
+print('Shoe:         {:.3f}s'.format(timeit.timeit(lambda: shoe.shuffle(rng), number=200)))
+if numpy is not None:
+    generator = numpy.random.default_rng(0)
+    print('Shoe(numpy):  {:.3f}s'.format(timeit.timeit(lambda: shoe.shuffle(generator), number=200)))
+
+
+# 并行的蒙特卡罗模拟
+# random.choice(deck)一次只抽一张牌，估计牌型概率需要发几百万手牌。MonteCarlo把手牌分成多个批次，在进程池中并行运行
+# 每个批次的随机数流由(seed, 批次号)确定，与进程数和完成顺序无关，所以同样的seed总能得到同样的结果
+# 每完成一个批次，就把它的计数作为一行JSON追加到检查点文件，中断后重新运行会跳过已完成的批次
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def hand_category(codes):  # 按编码判断5张牌的牌型，不创建Card对象
+    ranks = sorted((code >> 2 for code in codes), reverse=True)  # 编码除以4得到牌号，除以4的余数是花色
+    flush = len({code & 3 for code in codes}) == 1
+    straight = len(set(ranks)) == 5 and (ranks[0] - ranks[4] == 4 or ranks == [12, 3, 2, 1, 0])  # A可以当作1
+    shape = sorted(collections.Counter(ranks).values(), reverse=True)
+    if straight and flush:
+        return 'straight flush'
+    if shape[0] == 4:
+        return 'four of a kind'
+    if shape == [3, 2]:
+        return 'full house'
+    if flush:
+        return 'flush'
+    if straight:
+        return 'straight'
+    if shape[0] == 3:
+        return 'three of a kind'
+    if shape == [2, 2, 1]:
+        return 'two pair'
+    if shape[0] == 2:
+        return 'pair'
+    return 'high card'
+
+
+def simulate_batch(seed, batch, hands, decks, hand_size, play):  # 在工作进程中运行，必须定义在模块顶层才能被pickle
+    rng = random.Random('{}:{}'.format(seed, batch))  # 字符串种子在所有平台上都得到相同的随机数流
+    shoe = Shoe(decks)
+    shoe.shuffle(rng)
+    counts = collections.Counter()
+    for _ in range(hands):
+        if shoe.remaining < hand_size:
+            shoe.shuffle(rng)
+        counts[play(shoe.deal(hand_size))] += 1
+    return batch, counts
+
+
+def _from_json(key):  # JSON把元组保存成列表，读回时还原成元组，才能作为Counter的键
+    return tuple(map(_from_json, key)) if isinstance(key, list) else key
+
+
+def top_rank(codes):  # 另一种结果：一手牌中最大的牌号（0~12）
+    return max(code >> 2 for code in codes)
+
+
+class MonteCarlo:
+    def __init__(self, play=hand_category, seed=0, hands_per_batch=10000, decks=1, hand_size=5,
+                 checkpoint=None, workers=None):
+        self.play = play  # 接受一手牌的编码，返回结果的键；使用检查点时，键必须是字符串、数字、None或由它们构成的元组
+        self.seed = seed
+        self.hands_per_batch = hands_per_batch
+        self.decks = decks
+        self.hand_size = hand_size
+        self.checkpoint = checkpoint  # 检查点文件的路径，None表示不保存
+        self.workers = workers  # 0表示在当前进程中运行
+
+    def _completed(self):  # 读取检查点，返回{批次号: Counter}
+        completed = {}
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return completed
+        with open(self.checkpoint) as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # 最后一行可能在写入时中断
+                    continue
+                if all(record.get(key) == value for key, value in self._settings().items()):  # 只合并参数完全相同的批次
+                    completed[record['batch']] = collections.Counter({_from_json(key): n for key, n in record['counts']})
+        return completed
+
+    def _repair(self):  # 进程在写入时崩溃会留下不完整的最后一行，截断到最后一个换行符，否则下一条记录会接在它后面而无法解析
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, 'r+b') as fp:
+            size = fp.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            fp.seek(size - 1)
+            if fp.read(1) == b'\n':
+                return
+            fp.seek(0)
+            data = fp.read()
+            fp.truncate(data.rfind(b'\n') + 1)
+
+    def _settings(self):  # 决定批次结果的全部参数，play函数用它的完整名称表示
+        play = '{}.{}'.format(self.play.__module__, self.play.__qualname__)
+        return dict(seed=self.seed, hands=self.hands_per_batch, decks=self.decks, hand_size=self.hand_size, play=play)
+
+    def _record(self, fp, batch, counts):  # 计数保存为[键, 次数]的列表，JSON对象的键只能是字符串
+        record = dict(self._settings(), batch=batch, counts=[[key, n] for key, n in counts.items()])
+        fp.write(json.dumps(record) + '\n')
+        fp.flush()
+        os.fsync(fp.fileno())  # 确保批次结果在继续之前已经写入磁盘
+
+    def run(self, batches):  # 运行批次0到batches-1，返回合计的Counter
+        self._repair()
+        results = self._completed()
+        todo = [batch for batch in range(batches) if batch not in results]
+        args = (self.hands_per_batch, self.decks, self.hand_size, self.play)
+        fp = open(self.checkpoint, 'a') if self.checkpoint is not None else None
+        pool = None
+        try:
+            if self.workers == 0 or not todo:
+                finished = (simulate_batch(self.seed, batch, *args) for batch in todo)
+            else:
+                pool = ProcessPoolExecutor(self.workers)
+                futures = [pool.submit(simulate_batch, self.seed, batch, *args) for batch in todo]
+                finished = (future.result() for future in as_completed(futures))
+            for batch, counts in finished:
+                results[batch] = counts
+                if fp is not None:
+                    self._record(fp, batch, counts)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if fp is not None:
+                fp.close()
+        total = collections.Counter()
+        for batch in range(batches):
+            total.update(results[batch])
+        return total
+
+
+if __name__ == '__main__':  # 使用spawn启动的工作进程会导入本模块，示例不能在导入时运行
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint.jsonl')
+        MonteCarlo(seed=7, hands_per_batch=5000, checkpoint=path).run(6)  # 模拟运行到一半时中断
+        resumed = MonteCarlo(seed=7, hands_per_batch=5000, checkpoint=path).run(10)  # 只运行剩下的4个批次
+        MonteCarlo(seed=7, hands_per_batch=5000, decks=2, checkpoint=path).run(1)  # 参数不同的批次不会与上面的结果合并
+
+        ranks_path = os.path.join(tmp, 'ranks.jsonl')
+        MonteCarlo(play=top_rank, hands_per_batch=1000, checkpoint=ranks_path, workers=0).run(3)
+        with open(ranks_path, 'a') as fp:
+            fp.write('{"seed": 0, "bat')  # 模拟写到一半时崩溃
+        ranks = MonteCarlo(play=top_rank, hands_per_batch=1000, checkpoint=ranks_path, workers=0).run(4)
+        print(ranks == MonteCarlo(play=top_rank, hands_per_batch=1000, workers=0).run(4))  # 整数键和截断的最后一行都能正确恢复
+        # True
+        recovered = MonteCarlo(play=top_rank, hands_per_batch=1000, checkpoint=ranks_path)._completed()
+        print(sorted(recovered))
+        # [0, 1, 2, 3]
+        with open(path) as fp:
+            print(sum(1 for _ in fp))
+        # 11
+    fresh = MonteCarlo(seed=7, hands_per_batch=5000, workers=0).run(10)
+    print(resumed == fresh)  # 与进程数和是否中断无关
+    # True
+    total = sum(fresh.values())
+    for category, count in fresh.most_common(4):
+        print('{:<16}{:.4f}'.format(category, count / total))
+    # high card       0.50..
+    # pair            0.42..
+    # two pair        0.04..
+    # three of a kind 0.02..
+
+
+# 查表的手牌评估器
+from array import array
+# 逐手比较牌号和花色元组太慢。5张或7张牌的强弱只取决于两件事：各牌号出现的次数，以及是否同花
+# 牌号的多重集可以用组合数系统映射成连续的编号（完美散列）：5张牌只有C(17, 5)=6188种，7张牌只有C(19, 7)=50388种
+# 同花时按花色取出牌号的位掩码，用一张8192项的表查出最好的同花或同花顺。每手牌只需要排序、求和和一到两次查表
+# 三张表合计约130KB，第一次使用时构建，写入二进制文件，之后用mmap映射，启动时不需要重新计算
+# 表中的值是1~7462的等级，数值越大牌越强，同一等级的手牌强弱相同
+import bisect
+import itertools
+import math
+import mmap
+import struct
+import tempfile
+import time
+
+CATEGORIES = ['high card', 'pair', 'two pair', 'three of a kind', 'straight',
+              'flush', 'full house', 'four of a kind', 'straight flush']
+
+
+def hand_key(ranks, flush):  # 5张牌的比较键：(牌型, 用于比较大小的牌号)，只在构建表时使用
+    counts = collections.Counter(ranks)
+    groups = sorted(counts.items(), key=lambda item: (item[1], item[0]), reverse=True)  # 先按张数再按牌号
+    tiebreak = tuple(rank for rank, _ in groups)
+    shape = [count for _, count in groups]
+    straight = len(counts) == 5 and (tiebreak[0] - tiebreak[4] == 4 or tiebreak == (12, 3, 2, 1, 0))
+    if straight and tiebreak[0] == 12 and tiebreak[1] == 3:
+        tiebreak = (3,)  # A2345里A当作1，最大的牌是5
+    if straight:
+        category = 8 if flush else 4
+    elif flush:
+        category = 5
+    else:
+        category = {(4, 1): 7, (3, 2): 6, (3, 1, 1): 3, (2, 2, 1): 2, (2, 1, 1, 1): 1}.get(tuple(shape), 0)
+    return category, tiebreak
+
+
+class HandEvaluator:
+    HEADER = struct.Struct('<4sIII9H')  # 魔数、三张表的长度和每种牌型的最低等级
+    MAGIC = b'PKRT'
+    # _binomial[i][x]等于C(x, i+1)，多重集编号是sum(C(r_i + i, i + 1))，其中r_0 <= r_1 <= ...
+    _binomial = [[math.comb(x, i + 1) for x in range(20)] for i in range(7)]
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            self.build(path)
+        with open(path, 'rb') as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < self.HEADER.size:
+            self._map.close()
+            raise ValueError('not a hand ranking table: {!r}'.format(path))
+        magic, n5, n7, nflush, *self._category_starts = self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC or len(self._map) != self.HEADER.size + 2 * (n5 + n7 + nflush):  # 文件不完整时切片会悄悄变短
+            self._map.close()
+            raise ValueError('not a hand ranking table: {!r}'.format(path))
+        tables = memoryview(self._map)[self.HEADER.size:].cast('H')
+        self._rank5 = tables[:n5]
+        self._rank7 = tables[n5:n5 + n7]
+        self._flush = tables[n5 + n7:n5 + n7 + nflush]
+
+    def close(self):
+        self._rank5.release()
+        self._rank7.release()
+        self._flush.release()
+        self._map.close()
+
+    @classmethod
+    def _index(cls, ranks):  # ranks必须已经升序排列
+        return sum(cls._binomial[i][rank + i] for i, rank in enumerate(ranks))
+
+    @classmethod
+    def build(cls, path):
+        keys5 = {}  # 多重集编号 -> 比较键
+        for ranks in itertools.combinations_with_replacement(range(13), 5):
+            if max(ranks.count(rank) for rank in ranks) <= 4:
+                keys5[cls._index(ranks)] = hand_key(ranks, False)
+        flush_keys = {}  # 位掩码 -> 比较键
+        for ranks in itertools.combinations(range(13), 5):
+            flush_keys[sum(1 << rank for rank in ranks)] = hand_key(ranks, True)
+        levels = {key: level for level, key in enumerate(sorted(set(keys5.values()) | set(flush_keys.values())), 1)}
+        starts = [min(level for key, level in levels.items() if key[0] == category) for category in range(len(CATEGORIES))]
+
+        rank5 = array('H', [0]) * math.comb(17, 5)
+        for index, key in keys5.items():
+            rank5[index] = levels[key]
+        flush = array('H', [0]) * (1 << 13)
+        for mask, key in flush_keys.items():
+            flush[mask] = levels[key]
+        for size in (6, 7):  # 6到7张同花时，取其中最好的5张
+            for ranks in itertools.combinations(range(13), size):
+                flush[sum(1 << rank for rank in ranks)] = max(
+                    flush[sum(1 << rank for rank in five)] for five in itertools.combinations(ranks, 5))
+        rank7 = array('H', [0]) * math.comb(19, 7)
+        for ranks in itertools.combinations_with_replacement(range(13), 7):
+            if max(ranks.count(rank) for rank in ranks) <= 4:
+                rank7[cls._index(ranks)] = max(
+                    rank5[cls._index(five)] for five in set(itertools.combinations(ranks, 5)))
+
+        # 先写入同一目录下的临时文件，再用os.replace原子地替换，构建中断或并发构建时不会留下不完整的文件
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(cls.HEADER.pack(cls.MAGIC, len(rank5), len(rank7), len(flush), *starts))
+                fp.write(rank5.tobytes())
+                fp.write(rank7.tobytes())
+                fp.write(flush.tobytes())
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def evaluate5(self, codes):  # codes是5张牌的编码，例如Shoe.deal(5)的结果
+        a, b, c, d, e = codes
+        if (a & 3) == (b & 3) == (c & 3) == (d & 3) == (e & 3):
+            return self._flush[(1 << (a >> 2)) | (1 << (b >> 2)) | (1 << (c >> 2)) | (1 << (d >> 2)) | (1 << (e >> 2))]
+        r0, r1, r2, r3, r4 = sorted((a >> 2, b >> 2, c >> 2, d >> 2, e >> 2))
+        binomial = self._binomial
+        return self._rank5[binomial[0][r0] + binomial[1][r1 + 1] + binomial[2][r2 + 2]
+                           + binomial[3][r3 + 3] + binomial[4][r4 + 4]]
+
+    def evaluate7(self, codes):
+        masks = [0, 0, 0, 0]
+        for code in codes:
+            masks[code & 3] |= 1 << (code >> 2)
+        for mask in masks:
+            if bin(mask).count('1') >= 5:  # 7张牌里有5张同花时，不可能再组成四条或葫芦，同花就是最好的牌
+                return self._flush[mask]
+        return self._rank7[self._index(sorted(code >> 2 for code in codes))]
+
+    def category(self, level):  # 由等级得到牌型名称
+        return CATEGORIES[bisect.bisect_right(self._category_starts, level) - 1]
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'hand_ranks.bin')
+        start = time.perf_counter()
+        HandEvaluator.build(path)
+        print('build: {:.1f}s, {} bytes'.format(time.perf_counter() - start, os.path.getsize(path)))
+        start = time.perf_counter()
+        evaluator = HandEvaluator(path)  # 之后的启动只需要映射文件
+        print('load: {:.4f}s'.format(time.perf_counter() - start))
+        print(max(evaluator._flush), evaluator._category_starts)  # 共7462个等级
+        # 7462 [1, 1278, 4138, 4996, 5854, 5864, 7141, 7297, 7453]
+
+        royal = [CompactDeck.encode(Card(rank, 'hearts')) for rank in '10 J Q K A'.split()]
+        wheel = [CompactDeck.encode(Card(rank, suit)) for rank, suit in zip('A2345', FrenchDeck.suits * 2)]
+        print(evaluator.category(evaluator.evaluate5(royal)), evaluator.category(evaluator.evaluate5(wheel)))
+        # straight flush straight
+
+        rng = random.Random(1)
+        hands = [rng.sample(range(52), 7) for _ in range(20000)]
+        print(all(evaluator.category(evaluator.evaluate5(hand[:5])) == hand_category(hand[:5]) for hand in hands))
+        # True
+        print(all(evaluator.evaluate7(hand) == max(map(evaluator.evaluate5, itertools.combinations(hand, 5)))
+                  for hand in hands[:2000]))  # 与21种5张组合中最好的一种相同
+        # True
+
+        # 吞吐量
+        for name, evaluate, size in [('5 cards', evaluator.evaluate5, 5), ('7 cards', evaluator.evaluate7, 7),
+                                     ('hand_category', hand_category, 5)]:
+            sample = [hand[:size] for hand in hands]
+            start = time.perf_counter()
+            for hand in sample:
+                evaluate(hand)
+            print('{:<14}{:>12,.0f} hands/s'.format(name, len(sample) / (time.perf_counter() - start)))
+        evaluator.close()
+        with open(path, 'r+b') as fp:  # 模拟写到一半的文件
+            fp.truncate(1000)
+        try:
+            HandEvaluator(path)
+        except ValueError as error:
+            print(type(error).__name__)
+        # ValueError
+
+
+# 预先计算的排序键和计数排序
+# 上面注释掉的spades_high每次计算键都调用FrenchDeck.ranks.index()，在列表中线性查找
+# CardOrder在构造时就为52种编码算好键值，Card对象的排序键只是一次字典查询
+# 紧凑编码的牌只有52种取值，sort()用计数排序：统计每种编码出现的次数，再按键值顺序依次写出，时间是O(n)，不需要比较
+class CardOrder:
+    def __init__(self, rank_values, suit_values, suit_first=False):  # 两个参数都是 名称->值 的映射
+        def value(card):
+            rank, suit = rank_values[card.rank], suit_values[card.suit]
+            return suit * len(rank_values) + rank if suit_first else rank * len(suit_values) + suit
+
+        self._values = [value(card) for card in CompactDeck._cards]  # 编码 -> 键值
+        self._keys = {card: self._values[code] for code, card in enumerate(CompactDeck._cards)}
+        self._codes = sorted(range(len(self._values)), key=self._values.__getitem__)  # 按键值排列的编码
+
+    def key(self, card):  # 用作sorted()的key参数
+        return self._keys[card]
+
+    def sort(self, codes):  # 对编码序列计数排序，返回bytearray
+        if numpy is not None:
+            counts = numpy.bincount(numpy.frombuffer(bytes(codes), dtype=numpy.uint8),
+                                    minlength=len(self._values)).tolist()
+        else:
+            counts = collections.Counter(bytes(codes))
+        result = bytearray()
+        for code in self._codes:
+            result += bytes((code,)) * counts[code]
+        return result
+
+
+rank_values = {rank: value for value, rank in enumerate(FrenchDeck.ranks)}
+SPADES_HIGH = CardOrder(rank_values, dict(spades=3, hearts=2, diamonds=1, clubs=0))
+BRIDGE = CardOrder(rank_values, dict(spades=3, hearts=2, diamonds=1, clubs=0), suit_first=True)  # 先按花色再按牌号
+
+print(sorted(deck, key=SPADES_HIGH.key)[:3])
+# [Card(rank='2', suit='clubs'), Card(rank='2', suit='diamonds'), Card(rank='2', suit='hearts')]
+print(sorted(deck, key=BRIDGE.key)[-2:])
+# [Card(rank='K', suit='spades'), Card(rank='A', suit='spades')]
+
+big = Shoe(64)
+big.shuffle(random.Random(3))
+print(list(CompactDeck.decode(SPADES_HIGH.sort(big.codes))) == sorted(big, key=SPADES_HIGH.key))
+# True
+print('sorted(key=...): {:.3f}s'.format(timeit.timeit(lambda: sorted(big, key=SPADES_HIGH.key), number=20)))
+print('counting sort:   {:.3f}s'.format(timeit.timeit(lambda: SPADES_HIGH.sort(big.codes), number=20)))
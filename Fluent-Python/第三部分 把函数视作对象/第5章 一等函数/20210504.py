@@ -99,9 +99,10 @@ import random
 
 
 class BingoCage:  # 该类的实例使用任何可迭代对象构建，而且会在内部存储一个随机顺序排列的列表，调用该实例会取出一个元素
-    def __init__(self, items):  # 接受任何可迭代对象
+    def __init__(self, items, rng=None):  # 接受任何可迭代对象；rng是random.Random实例，传入种子相同的实例可以重现结果
+        self._randomizer = rng if rng is not None else random.Random()
         self._items = list(items)  # 在本地构建一个副本，防止列表参数的意外副作用
-        random.shuffle(self._items)  # 随机打乱列表中的元素
+        self._randomizer.shuffle(self._items)  # 随机打乱列表中的元素
 
     def pick(self):
         try:
@@ -109,6 +110,16 @@ class BingoCage:  # 该类的实例使用任何可迭代对象构建，而且会
         except IndexError:
             raise LookupError('pick from empty BingoCage')  # 抛出异常，设定错误消息
 
+    def pick_many(self, n):  # 一次取出n个元素，顺序与连续调用n次pick()相同
+        if n > len(self._items):
+            raise LookupError('pick {} from BingoCage with {} items'.format(n, len(self._items)))
+        if n <= 0:
+            return []
+        picked = self._items[-n:]
+        del self._items[-n:]
+        picked.reverse()
+        return picked
+
     def __call__(self, *args, **kwargs):  # bingo.pick()的快捷方式是bingo()
         return self.pick()
 
@@ -117,6 +128,9 @@ bingo = BingoCage(range(3))
 print(bingo.pick())
 print(bingo())  # bingo实例可以作为函数调用
 print(callable(bingo))  # True
+cage = BingoCage(range(10), rng=random.Random(42))
+print(cage.pick_many(3) == BingoCage(range(10), rng=random.Random(42)).pick_many(3))  # 种子相同，结果相同
+# True
 
 """6、函数内省"""
 # 除了__doc__，函数对象还有很多属性。使用dir函数可以探知factorial具有下述属性：
@@ -103,3 +103,53 @@ print({chr(i) for i in range(32, 256) if 'SIGN' in name(chr(i), '')})  # 把编
 # 3）可以很高效地判断元素是否存在于某个集合
 # 4）元素地次序取决于被添加到集合里的次序
 # 5）往集合里添加元素，可能会改变集合里已有元素的次序
+
+
+
+"""10、散列冲突分析"""
+# 自定义__hash__之前，最好检查一下一组典型的键在散列表中的分布。hash_report()模拟dict的散列表：表的大小是2的幂，装载因子不超过2/3，
+# 用散列值最低的几位作为第一次探测的表元。统计结果：
+# * hash_collisions：散列值完全相同的键的数量（除了每组中的第一个），这种冲突无法通过扩容解决
+# * bucket_collisions：第一次探测就落在已占用表元上的键的数量
+# * max_bucket_load：落在同一个表元上最多的键数
+# keys应该是互不相等的键（不用集合去重，因为散列值很差时，构建集合本身就很慢）
+import collections
+
+HashReport = collections.namedtuple('HashReport', 'keys table_size distinct_hashes hash_collisions bucket_collisions max_bucket_load')
+
+
+def hash_report(keys, table_size=None):
+    hashes = [hash(key) for key in keys]
+    if table_size is None:
+        table_size = 8  # dict的最小容量
+        while table_size * 2 < len(hashes) * 3:
+            table_size *= 2
+    by_hash = collections.Counter(hashes)
+    buckets = collections.Counter(h & (table_size - 1) for h in hashes)
+    return HashReport(keys=len(hashes),
+                      table_size=table_size,
+                      distinct_hashes=len(by_hash),
+                      hash_collisions=len(hashes) - len(by_hash),
+                      bucket_collisions=len(hashes) - len(buckets),
+                      max_bucket_load=max(buckets.values(), default=0))
+
+
+# 对比两种二维点的散列方式
+class XorPoint:
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+    def __hash__(self):
+        return hash(self.x) ^ hash(self.y)
+
+
+class TuplePoint(XorPoint):
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+
+grid = [(x, y) for x in range(100) for y in range(100)]
+print(hash_report(XorPoint(x, y) for x, y in grid))
+# HashReport(keys=10000, table_size=16384, distinct_hashes=128, hash_collisions=9872, bucket_collisions=9872, max_bucket_load=100)
+print(hash_report(TuplePoint(x, y) for x, y in grid))
+# HashReport(keys=10000, table_size=16384, distinct_hashes=10000, hash_collisions=0, bucket_collisions=1424, max_bucket_load=4)
@@ -23,7 +23,10 @@ class Vector:
         return iter(self._components)  # 构建一个迭代器
 
     def __repr__(self):
-        components = reprlib.repr(self._components)  # 使用reprlib.repr()函数获取self.components的有限长度表现形式（如 array('d', [0.0, 1.0, 2.0, 3.0, 4.0, ...])）
+        components = self._components
+        if not isinstance(components, array):  # 视图的_components是memoryview，只取前几个分量转换成数组，供reprlib显示
+            components = array(self.typecode, components[:reprlib.aRepr.maxarray + 1])
+        components = reprlib.repr(components)  # 使用reprlib.repr()函数获取self.components的有限长度表现形式（如 array('d', [0.0, 1.0, 2.0, 3.0, 4.0, ...])）
         components = components[components.find('['):-1]  # 去掉前面的 array('d' 和后面的 )，保留[]内的内容（包括一堆方括号）
         return 'Vector({})'.format(components)
 
@@ -42,12 +45,37 @@ class Vector:
                 return False
         return True
         """
+        if isinstance(other, Vector):  # 快速路径：比较两个memoryview，在C语言层面一次遍历缓冲，不创建float对象
+            # memoryview按格式逐个比较值，而不是逐字节比较，所以NaN不等于NaN，0.0等于-0.0，typecode不同也能比较，结果与逐个分量使用==完全一样
+            return len(self) == len(other) and memoryview(self._components) == memoryview(other._components)
         return len(self) == len(other) and all(a == b for a, b in zip(self, other))  # 用all()函数比较所有分量的结果都是True，首先要检查两个操作数长度是否相同，因为zip()函数会在最短的那个操作数耗尽时停止
 
+    def allclose(self, other, rel_tol=1e-09, abs_tol=0.0):  # 逐个分量套用math.isclose()的判断规则，一次遍历
+        if rel_tol < 0.0 or abs_tol < 0.0:
+            raise ValueError('tolerances must be non-negative')
+        if len(self) != len(other):
+            return False
+        if numpy is not None and isinstance(other, Vector):
+            x, y = (numpy.frombuffer(v._components, dtype=memoryview(v._components).format) for v in (self, other))
+            with numpy.errstate(invalid='ignore'):  # inf - inf得到nan，不发出警告
+                diff = numpy.abs(x - y)
+                tol = numpy.maximum(rel_tol * numpy.maximum(numpy.abs(x), numpy.abs(y)), abs_tol)
+                close = (x == y) | (numpy.isfinite(diff) & (diff <= tol))  # 与math.isclose()一样：相等的无穷大是接近的，其他无穷大和NaN都不接近
+            return bool(close.all())
+        isclose = functools.partial(math.isclose, rel_tol=rel_tol, abs_tol=abs_tol)
+        return all(map(isclose, self, other))  # map和partial都在C语言层面调用，不执行逐个分量的字节码
+
     def __hash__(self):
+        """ 用异或归约各分量的散列值，与分量的顺序无关，分量相同、顺序不同的向量全都冲突
         hashes = (hash(x) for x in self._components)  # 创建一个生成器表达式，惰性计算各个分量的散列值，得到一个可迭代对象
         # hashes = map(hash, self._components)  # 也可以使用map()函数，将函数应用到各个元素上，生成一个新序列
         return functools.reduce(operator.xor, hashes, 0)  # 使用xor函数计算聚合的散列值，第三个参数0是初始值
+        """
+        try:  # Vector不可变，散列值只计算一次，缓存在实例中
+            return self._hash
+        except AttributeError:
+            self._hash = hash(tuple(self._components))  # 元组的散列算法与顺序有关，混合得很充分，而且在C语言层面一次遍历完成；hash(0.0) == hash(-0.0)，与==一致
+            return self._hash
 
     def __abs__(self):
         return math.sqrt(sum(x * x for x in self))  # 首先计算各分量的平方之和，然后再使用sqrt方法开平方
@@ -100,13 +128,32 @@ class Vector:
         else:
             return a
 
-    def angles(self):  # 创建生成器表达式，按需计算所有角坐标
-        return (self.angle(n) for n in range(1, len(self)))
+    def angles(self):  # 返回所有角坐标的迭代器；逐个调用angle(n)要反复切片和求平方和，是O(n²)的，这里改用angle_array()一次算出
+        return iter(self.angle_array())
+
+    def angle_array(self):  # 批量计算所有角坐标，返回array，时间和内存都是O(n)
+        components = self._components
+        squares = (x * x for x in reversed(components))
+        tails = list(itertools.accumulate(squares))[::-1]  # 逆序累加，tails[k]是第k个及之后各分量的平方和
+        angles = array(self.typecode, (math.atan2(math.sqrt(tails[n]), components[n-1]) for n in range(1, len(self))))
+        if angles and components[-1] < 0:  # 与angle(n)相同：最后一个角坐标的范围是[0, 2π)
+            angles[-1] = math.pi * 2 - angles[-1]
+        return angles
+
+    @classmethod
+    def from_polar(cls, r, angles):  # angle_array()的逆运算：由模和角坐标构建Vector，连乘正弦值，O(n)
+        components = array(cls.typecode)
+        scale = r
+        for phi in angles:
+            components.append(scale * math.cos(phi))
+            scale *= math.sin(phi)
+        components.append(scale)
+        return cls(components)
 
     def __format__(self, format_spec=''):  # 格式化函数
         if format_spec.endswith('h'):  # 超球面坐标
             format_spec = format_spec[:-1]
-            coords = itertools.chain([abs(self), self.angles()])  # 使用itertools.chain函数生成生成器表达式，无缝迭代向量的模和各个角坐标
+            coords = itertools.chain([abs(self)], self.angles())  # 使用itertools.chain函数生成生成器表达式，无缝迭代向量的模和各个角坐标
             outer_fmt = '<{}>'  # 使用尖括号显示球面坐标
         else:
             coords = self
@@ -118,9 +165,60 @@ class Vector:
     @classmethod
     def frombytes(cls, octets):  # 不用传入self参数，相反需要通过cls传入类本身
         typecode = chr(octets[0])  # 从第一个字节中读取typecode
-        memv = memoryview(octets[1:]).cast(typecode)  # 使用传入的octets字节序列创建一个memoryview
+        memv = memoryview(octets)[1:].cast(typecode)  # 使用传入的octets字节序列创建一个memoryview，先创建memoryview再切片，避免octets[1:]复制整个字节序列
         return cls(memv)  # 直接把memoryview传给构造方法，无需拆包
 
+    # 不调用构造方法，直接使用传入的分量，因此不会复制
+    @classmethod
+    def _wrap(cls, components):  # components是typecode相同的array，或者是已经转换成typecode格式的只读memoryview（视图）
+        vector = cls.__new__(cls)
+        vector._components = components
+        return vector
+
+    @classmethod
+    def _array(cls, memv):  # 一次复制memoryview中的全部字节，构建新数组
+        components = array(cls.typecode)
+        components.frombytes(memv.cast('B'))
+        return components
+
+    # 视图模式：从任何支持缓冲协议的对象构建Vector，默认不复制
+    @classmethod
+    def frombuffer(cls, buffer, copy=False):  # buffer可以是bytes、bytearray、mmap或tobuffer()的返回值
+        memv = memoryview(buffer)
+        if memv.format in ('B', 'b', 'c'):  # 字节序列的格式与frombytes相同：第一个字节是typecode
+            memv = memv.cast('B')
+            typecode = chr(memv[0])
+            memv = memv[1:].cast(typecode)  # 先切片再转换，切片memoryview不会复制数据
+        else:  # 有类型的缓冲（如tobuffer()的返回值），格式就是typecode
+            typecode = memv.format
+        if typecode != cls.typecode:  # typecode不同时只能逐个转换分量
+            return cls(memv)
+        if copy:
+            return cls._wrap(cls._array(memv))
+        return cls._wrap(memv.toreadonly())  # 只读视图，调用方不能通过Vector修改原缓冲
+
+    def tobuffer(self):  # 与__bytes__对应，返回分量的只读memoryview，不复制数据；typecode保存在memoryview的format属性中
+        return memoryview(self._components).toreadonly()
+
+    def __getstate__(self):  # memoryview不能序列化，pickle时把视图复制成数组，实例本身仍然是视图
+        state = self.__dict__.copy()
+        if not isinstance(self._components, array):
+            state['_components'] = self._array(self._components)
+        return state
+
+    def __reduce_ex__(self, protocol):  # pickle协议5：分量包装成PickleBuffer，可以带外（out-of-band）传输，不复制
+        if protocol >= 5:
+            import pickle
+            return type(self)._frompickle, (self.typecode, pickle.PickleBuffer(self._components))
+        return super().__reduce_ex__(protocol)
+
+    @classmethod
+    def _frompickle(cls, typecode, buffer):  # buffer是带外传回的缓冲，或者是普通的字节序列，都直接建立视图
+        memv = memoryview(buffer).cast('B').cast(typecode)
+        if typecode != cls.typecode:
+            return cls(memv)
+        return cls._wrap(memv.toreadonly())
+
 
 # 测试
 print(Vector([3.1, 4.2]))
@@ -218,3 +316,721 @@ import functools
 functools.reduce(lambda a,b: a*b, range(1, 6))  # 计算5的阶乘
 # 120
 '''
+
+
+"""6、VectorBatch：在一块连续内存中存储多个向量"""
+# 每个Vector实例都有自己的array、对象头和__dict__，数量达到几十万时，这些开销比分量本身还大
+# VectorBatch把N个长度相同的向量按行优先的顺序存储在一个array中，每个向量只占用8*dim个字节。批量运算一次处理整个缓冲：安装了NumPy时使用矩阵运算，否则退回纯Python实现
+# 通过索引获取的行是Vector视图，与VectorBatch共享内存（只读），需要时才创建
+import sys
+
+try:  # NumPy是可选依赖
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class VectorBatch:
+    """ 存储多个等长向量的容器。batch[i]返回共享内存的行视图，只要还有行视图存在，append()就会抛出BufferError；需要保留的行可以先用Vector(row)复制 """
+    __slots__ = ('_dim', '_data')  # 不需要__dict__
+    typecode = 'd'
+
+    def __init__(self, vectors=(), dim=None):
+        self._dim = dim
+        self._data = array(self.typecode)
+        for vector in vectors:
+            self.append(vector)
+
+    @property
+    def dim(self):
+        return self._dim
+
+    def append(self, vector):  # 存在行视图时，array不能改变大小，会抛出BufferError
+        if not isinstance(self._data, array):  # 切片得到的批次与原批次共享只读内存，第一次追加时才复制成自己的数组（写时复制）
+            data = array(self.typecode)
+            data.frombytes(self._data.cast('B'))
+            self._data = data
+        if isinstance(vector, Vector):
+            components = vector._components
+        else:
+            components = array(self.typecode, vector)
+        if self._dim is None:
+            self._dim = len(components)
+        elif len(components) != self._dim:
+            msg = 'expected a vector of dimension {}, got {}'
+            raise ValueError(msg.format(self._dim, len(components)))
+        self._data.frombytes(memoryview(components).cast('B'))  # 直接追加原始字节，不逐个转换分量
+
+    def __len__(self):
+        return len(self._data) // self._dim if self._dim else 0
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, index):
+        cls = type(self)
+        if isinstance(index, slice):  # 切片得到新的VectorBatch，步幅为1时共享内存
+            start, stop, step = index.indices(len(self))
+            if self._dim is None:  # 还没有载入向量，维度未知
+                return cls()
+            if step == 1:
+                batch = cls.__new__(cls)
+                batch._dim = self._dim
+                batch._data = self._memv()[start * self._dim:max(start, stop) * self._dim]
+                return batch
+            return cls((self[i] for i in range(start, stop, step)), self._dim)
+        elif isinstance(index, numbers.Integral):
+            row = range(len(self))[index]  # 处理负数索引，越界时抛出IndexError
+            return Vector._wrap(self._memv()[row * self._dim:(row + 1) * self._dim])
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    def __repr__(self):
+        return '{}(<{} vectors of dimension {}>)'.format(type(self).__name__, len(self), self._dim)
+
+    def _memv(self):  # 整个缓冲的只读memoryview
+        memv = memoryview(self._data)
+        return memv if memv.readonly else memv.toreadonly()
+
+    def _matrix(self):  # N×dim的NumPy视图，不复制数据
+        return numpy.frombuffer(self._data, dtype=self.typecode).reshape(len(self), self._dim or 0)
+
+    def _rows(self):
+        memv, dim = self._memv(), self._dim
+        return (memv[i * dim:(i + 1) * dim] for i in range(len(self)))
+
+    def tolist(self):  # 转换成Vector列表，每个Vector都有自己的array
+        return [Vector(row) for row in self._rows()]
+
+    def norms(self):  # 批量计算每个向量的模，返回array
+        if numpy is not None:
+            m = self._matrix()
+            return array(self.typecode, numpy.sqrt(numpy.einsum('ij,ij->i', m, m)).tobytes())
+        return array(self.typecode, (math.sqrt(sum(x * x for x in row)) for row in self._rows()))
+
+    def __matmul__(self, other):  # 逐行点积：other是等长的VectorBatch时计算两两对应的行，是Vector时计算每一行与它的点积
+        if isinstance(other, VectorBatch):
+            if len(other) != len(self) or other.dim != self._dim:
+                raise ValueError('batches must have the same shape')
+            if numpy is not None:
+                return array(self.typecode, numpy.einsum('ij,ij->i', self._matrix(), other._matrix()).tobytes())
+            pairs = zip(self._rows(), other._rows())
+            return array(self.typecode, (sum(a * b for a, b in zip(r1, r2)) for r1, r2 in pairs))
+        elif isinstance(other, Vector):
+            if len(other) != self._dim:
+                raise ValueError('vector must have dimension {}'.format(self._dim))
+            if numpy is not None:
+                vector = numpy.frombuffer(other._components, dtype=self.typecode)
+                return array(self.typecode, (self._matrix() @ vector).tobytes())
+            return array(self.typecode, (sum(a * b for a, b in zip(row, other)) for row in self._rows()))
+        else:
+            return NotImplemented
+
+    def normalized(self):  # 返回新的VectorBatch，每一行都除以自己的模；模为0的行保持不变
+        cls = type(self)
+        batch = cls(dim=self._dim)
+        if numpy is not None:
+            m = self._matrix()
+            norms = numpy.sqrt(numpy.einsum('ij,ij->i', m, m))
+            norms[norms == 0] = 1.0
+            batch._data.frombytes((m / norms[:, None]).tobytes())
+        else:
+            for row, norm in zip(self._rows(), self.norms()):
+                norm = norm or 1.0
+                batch._data.extend(x / norm for x in row)
+        return batch
+
+
+# 测试
+vectors = [Vector([3, 4]), Vector([6, 8]), Vector([0, 0]), Vector([1, 0])]
+batch = VectorBatch(vectors)
+print(batch, batch.norms())
+# VectorBatch(<4 vectors of dimension 2>) array('d', [5.0, 10.0, 0.0, 1.0])
+print(batch @ Vector([1, 1]))
+# array('d', [7.0, 14.0, 0.0, 1.0])
+print(batch @ batch)  # 两两对应的行做点积
+# array('d', [25.0, 100.0, 0.0, 1.0])
+print(batch.normalized().tolist())
+# [Vector([0.6, 0.8]), Vector([0.6, 0.8]), Vector([0.0, 0.0]), Vector([1.0, 0.0])]
+row = batch[-3]  # 索引得到的行是共享内存的Vector视图
+print(repr(row), abs(row), row == Vector([6, 8]), batch.tolist() == vectors)
+# Vector([6.0, 8.0]) 10.0 True True
+print(batch[1:3], list(batch[1:3]))
+# VectorBatch(<2 vectors of dimension 2>) [Vector([6.0, 8.0]), Vector([0.0, 0.0])]
+part = batch[1:3]
+part.append([5, 5])  # 切片第一次追加时复制，原批次不受影响
+print(len(part), len(batch), part[-1] == Vector([5, 5]))
+# 3 4 True
+print(len(VectorBatch()[0:1]))
+# 0
+
+# 对比内存占用：VectorBatch只比原始分量多一个对象头
+vectors = [Vector(range(10)) for _ in range(1000)]
+batch = VectorBatch(vectors)
+print(sum(sys.getsizeof(v) + sys.getsizeof(v.__dict__) + sys.getsizeof(v._components) for v in vectors))
+print(sys.getsizeof(batch) + sys.getsizeof(batch._data))  # 接近 8 * 10 * 1000 = 80000
+
+
+"""7、视图模式：零复制的frombuffer和tobuffer"""
+# frombytes先把字节序列转换成memoryview，然后复制到新的array中。解码大型向量时，这次复制会让内存峰值翻倍
+# frombuffer(buf, copy=False)直接在调用方的缓冲（包括mmap）上建立只读的memoryview，Vector不可变，所以视图永远不需要复制；需要独立的数组时传入copy=True
+# tobuffer()返回分量的只读memoryview，与__bytes__对应，但不复制；frombuffer(v.tobuffer())从memoryview的format属性中读取typecode
+# 注意：只要还有视图引用mmap，mmap就不能关闭（会抛出BufferError）
+import mmap
+import pickle
+import tempfile
+
+payload = bytes(Vector(range(100000)))
+v = Vector.frombuffer(payload)
+print(repr(v), type(v._components).__name__, v == Vector.frombytes(payload))
+# Vector([0.0, 1.0, 2.0, 3.0, 4.0, ...]) memoryview True
+w = Vector.frombuffer(v.tobuffer())  # 与v共享同一块内存
+print(w.tobuffer().obj is payload, bytes(w) == payload)
+# True True
+
+with tempfile.TemporaryFile() as fp:  # 直接读取磁盘上的向量，由操作系统按需分页载入
+    fp.write(payload)
+    fp.flush()
+    mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    v = Vector.frombuffer(mm)
+    print(abs(v[:3]), v[99999], pickle.loads(pickle.dumps(v)) == v)  # pickle时复制成数组
+    # 2.23606797749979 99999.0 True
+    del v
+    mm.close()
+
+
+"""8、VectorStore：基于mmap的磁盘向量存储"""
+# array.tofile/fromfile（见第2章）会把所有数据一次读入内存。VectorStore把维度相同的Vector记录存储在一个文件中，通过mmap按需分页载入，数据量可以超过内存
+''' 文件格式
+头部（24字节，小端序）：
+    4s  魔数 b'VECS'
+    c   typecode
+    3x  填充
+    I   维度dim
+    Q   记录数量count
+    4x  填充，让记录从8的倍数处开始
+之后是count条记录，每条记录是dim个分量的原始字节，没有typecode前缀
+'''
+import os
+import struct
+
+
+class VectorStore:
+    """ 存储固定维度Vector记录的文件，支持O(1)随机访问和追加 """
+    header = struct.Struct('<4sc3xIQ4x')
+    magic = b'VECS'
+
+    def __init__(self, path, dim=None, typecode='d'):
+        if os.path.exists(path) and os.path.getsize(path) > 0:  # 打开现有文件，读取头部
+            self._file = open(path, 'r+b')
+            magic, typecode, stored_dim, self._count = self.header.unpack(self._file.read(self.header.size))
+            if magic != self.magic:
+                raise ValueError('{!r} is not a VectorStore file'.format(path))
+            if dim is not None and dim != stored_dim:
+                raise ValueError('expected dimension {}, file has {}'.format(dim, stored_dim))
+            self.typecode, self.dim = typecode.decode(), stored_dim
+        else:  # 新建文件，必须指定维度
+            if dim is None:
+                raise ValueError('dim is required to create a VectorStore')
+            self._file = open(path, 'w+b')
+            self.typecode, self.dim, self._count = typecode, dim, 0
+            self._write_header()
+        self._record_size = self.dim * array(self.typecode).itemsize
+        self._memv = None  # 映射到内存的记录，需要时才创建
+        self._mapped = 0  # _memv中的记录数量
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(self.header.pack(self.magic, self.typecode.encode(), self.dim, self._count))
+        self._file.flush()
+
+    def _map(self):  # 追加之后，映射的范围不包括新记录，按需重新映射整个文件
+        if self._mapped < self._count:
+            length = self.header.size + self._count * self._record_size
+            mm = mmap.mmap(self._file.fileno(), length, access=mmap.ACCESS_READ)
+            self._memv = memoryview(mm)[self.header.size:].cast(self.typecode)  # 旧的映射仍被视图引用时由视图保持有效，没有引用后自动释放
+            self._mapped = self._count
+        return self._memv
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):  # 返回第index条记录的Vector视图，不复制数据
+        if not isinstance(index, numbers.Integral):
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=type(self)))
+        index = range(self._count)[index]  # 处理负数索引，越界时抛出IndexError
+        start = index * self.dim
+        return Vector.frombuffer(self._map()[start:start + self.dim])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def append(self, vector):
+        self.extend([vector])
+
+    def extend(self, vectors, buffer_size=1 << 20):  # 在文件末尾写入新记录，不改写已有数据；先写数据，再更新头部的记录数量
+        buffer = bytearray()
+        added = 0
+        self._file.seek(self.header.size + self._count * self._record_size)
+        for vector in vectors:
+            if isinstance(vector, Vector) and vector.typecode == self.typecode:
+                raw = vector.tobuffer()
+            else:
+                raw = array(self.typecode, vector)
+            if len(raw) != self.dim:
+                raise ValueError('expected a vector of dimension {}, got {}'.format(self.dim, len(raw)))
+            buffer += raw.cast('B') if isinstance(raw, memoryview) else raw.tobytes()
+            added += 1
+            if len(buffer) >= buffer_size:  # 缓冲写入，避免每条记录一次系统调用
+                self._file.write(buffer)
+                buffer.clear()
+        self._file.write(buffer)
+        self._file.flush()
+        self._count += added
+        self._write_header()
+
+    def close(self):  # 关闭文件；已经取出的视图仍然可用，直到它们被回收
+        self._memv = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 测试
+with tempfile.TemporaryDirectory() as tmpdir:
+    path = os.path.join(tmpdir, 'vectors.vecs')
+    with VectorStore(path, dim=3) as store:
+        store.extend(Vector([i, i + 1, i + 2]) for i in range(1000))
+        print(len(store), repr(store[10]), repr(store[-1]))
+        # 1000 Vector([10.0, 11.0, 12.0]) Vector([999.0, 1000.0, 1001.0])
+    with VectorStore(path) as store:  # 重新打开文件，追加记录，不改写已有数据
+        first = store[0]
+        store.append([7, 8, 9])
+        print(len(store), repr(store[1000]), repr(first), sum(abs(v) for v in store) > 0)
+        # 1001 Vector([7.0, 8.0, 9.0]) Vector([0.0, 1.0, 2.0]) True
+    del first
+
+
+"""9、SparseVector：高维稀疏向量"""
+# 维度达到几百万、非零分量不到1%时，稠密的array('d')太浪费。SparseVector只存储两个有序数组：非零分量的索引和值
+# 它实现了与Vector相同的协议；加法和点积按索引顺序合并两个非零分量序列（归并连接），只处理非零分量。与稠密的Vector混合运算时，加法返回稠密的Vector
+import bisect
+import collections.abc
+
+
+class SparseVector:
+    """ 稀疏向量，只存储非零分量 """
+    typecode = 'd'
+    index_typecode = 'Q'  # 索引使用无符号64位整数
+
+    def __init__(self, dim, components=()):  # components是{索引: 值}映射，或者由(索引, 值)对构成的可迭代对象
+        if isinstance(components, collections.abc.Mapping):
+            components = components.items()
+        pairs = {}
+        for index, value in components:
+            if not 0 <= index < dim:
+                raise IndexError('index {} out of range for dimension {}'.format(index, dim))
+            pairs[index] = pairs.get(index, 0.0) + value
+        nonzero = sorted((i, x) for i, x in pairs.items() if x)  # 不存储0
+        self._dim = dim
+        self._indices = array(self.index_typecode, (i for i, _ in nonzero))
+        self._values = array(self.typecode, (x for _, x in nonzero))
+
+    @classmethod
+    def _fromarrays(cls, dim, indices, values):  # indices已经有序，values中没有0
+        vector = cls.__new__(cls)
+        vector._dim, vector._indices, vector._values = dim, indices, values
+        return vector
+
+    @classmethod
+    def fromdense(cls, components):
+        components = list(components)
+        return cls(len(components), ((i, x) for i, x in enumerate(components) if x))
+
+    def todense(self):
+        return Vector(self)
+
+    @property
+    def nnz(self):  # 非零分量的数量
+        return len(self._values)
+
+    def __len__(self):
+        return self._dim
+
+    def __iter__(self):  # 按稠密向量的顺序产出所有分量，包括0.0
+        position = 0
+        for index, value in zip(self._indices, self._values):
+            yield from itertools.repeat(0.0, index - position)
+            yield value
+            position = index + 1
+        yield from itertools.repeat(0.0, self._dim - position)
+
+    def items(self):  # 产出(索引, 值)对，只包括非零分量
+        return zip(self._indices, self._values)
+
+    def __repr__(self):
+        return '{}({}, {})'.format(type(self).__name__, self._dim, reprlib.repr(dict(self.items())))
+
+    def __str__(self):
+        return str(tuple(self))
+
+    def __getitem__(self, index):
+        cls = type(self)
+        if isinstance(index, slice):
+            positions = range(*index.indices(self._dim))
+            pairs = ((positions.index(i), x) for i, x in self.items() if i in positions)  # range的in运算和index方法都是O(1)
+            return cls(len(positions), pairs)
+        elif isinstance(index, numbers.Integral):
+            index = range(self._dim)[index]  # 处理负数索引，越界时抛出IndexError
+            position = bisect.bisect_left(self._indices, index)  # 在有序的索引数组中二分查找
+            if position < len(self._indices) and self._indices[position] == index:
+                return self._values[position]
+            return 0.0
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    def __eq__(self, other):
+        if isinstance(other, SparseVector):  # 不存储0，所以只需要比较两个数组
+            return self._dim == other._dim and self._indices == other._indices and self._values == other._values
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __hash__(self):  # 必须与分量相同的稠密Vector一致，所以按稠密的顺序计算，代价是O(dim)，只计算一次
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(tuple(self))
+            return self._hash
+
+    def __abs__(self):
+        return math.sqrt(sum(x * x for x in self._values))
+
+    def __bool__(self):
+        return bool(self._values)
+
+    def _merge(self, other):  # 归并两个有序的非零分量序列，产出(索引, x, y)，缺少的一方为0.0
+        ia, va, ib, vb = self._indices, self._values, other._indices, other._values
+        i = j = 0
+        while i < len(ia) and j < len(ib):
+            if ia[i] == ib[j]:
+                yield ia[i], va[i], vb[j]
+                i += 1
+                j += 1
+            elif ia[i] < ib[j]:
+                yield ia[i], va[i], 0.0
+                i += 1
+            else:
+                yield ib[j], 0.0, vb[j]
+                j += 1
+        for k in range(i, len(ia)):
+            yield ia[k], va[k], 0.0
+        for k in range(j, len(ib)):
+            yield ib[k], 0.0, vb[k]
+
+    def __add__(self, other):  # 长度不同时与Vector一样用0.0填充
+        if isinstance(other, SparseVector):
+            indices, values = array(self.index_typecode), array(self.typecode)
+            for index, x, y in self._merge(other):
+                if x + y:
+                    indices.append(index)
+                    values.append(x + y)
+            return SparseVector._fromarrays(max(self._dim, other._dim), indices, values)
+        try:  # 与稠密的向量相加，结果也是稠密的
+            dense = array(self.typecode, other)
+        except TypeError:
+            return NotImplemented
+        if len(dense) < self._dim:
+            dense.extend(itertools.repeat(0.0, self._dim - len(dense)))
+        for index, value in self.items():
+            dense[index] += value
+        return Vector(dense)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __mul__(self, other):  # 标量乘法
+        if isinstance(other, numbers.Real):
+            pairs = ((i, x * other) for i, x in self.items())
+            return SparseVector(self._dim, pairs)
+        else:
+            return NotImplemented
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __matmul__(self, other):  # 点积
+        if isinstance(other, SparseVector):  # 只有两边索引相同的分量才有贡献
+            return sum(x * y for _, x, y in self._merge(other) if x and y)
+        try:
+            size = len(other)
+            return sum(x * other[i] for i, x in self.items() if i < size)  # 与zip一样，忽略较长一方多出的分量
+        except TypeError:
+            return NotImplemented
+
+    def __rmatmul__(self, other):
+        return self @ other
+
+    def __bytes__(self):  # typecode、维度和非零分量数量，然后是索引数组和值数组
+        header = array(self.index_typecode, [self._dim, len(self._values)])
+        return bytes([ord(self.typecode)]) + bytes(header) + bytes(self._indices) + bytes(self._values)
+
+    @classmethod
+    def frombytes(cls, octets):
+        typecode = chr(octets[0])
+        memv = memoryview(octets)[1:]
+        size = array(cls.index_typecode).itemsize
+        dim, nnz = memv[:2 * size].cast(cls.index_typecode)
+        indices = array(cls.index_typecode)
+        indices.frombytes(memv[2 * size:(2 + nnz) * size])
+        values = array(cls.typecode, memv[(2 + nnz) * size:].cast(typecode))
+        return cls._fromarrays(dim, indices, values)
+
+
+# 测试
+sv = SparseVector(1000000, {3: 1.0, 10: 2.0, 999999: -4.0})
+print(repr(sv), len(sv), sv.nnz)
+# SparseVector(1000000, {3: 1.0, 10: 2.0, 999999: -4.0}) 1000000 3
+print(sv[10], sv[11], sv[-1], repr(sv[2:12]), repr(sv[::-1][:1]))
+# 2.0 0.0 -4.0 SparseVector(10, {1: 1.0, 8: 2.0}) SparseVector(1, {0: -4.0})
+sw = SparseVector(1000000, {10: 3.0, 500: 1.0})
+print(repr(sv + sw), sv @ sw, abs(sv * 2))
+# SparseVector(1000000, {3: 1.0, 10: 5.0, 500: 1.0, 999999: -4.0}) 6.0 9.16515138991168
+dense = Vector([1, 1, 1, 1, 1])
+print(repr(sv[:5] + dense), dense @ sv[:5], SparseVector.fromdense([0, 0, 0, 1, 0]) == Vector([0, 0, 0, 1, 0]))
+# Vector([1.0, 1.0, 1.0, 2.0, 1.0]) 1.0 True
+print(SparseVector.frombytes(bytes(sv)) == sv, hash(sv[:5]) == hash(sv[:5].todense()), len(bytes(sv)))
+# True True 65
+
+
+"""10、线性时间的超球面坐标"""
+# angle(n)每次都要切片self[n:]，创建新的Vector，再对整个尾部求平方和，所以format(v, 'h')是O(n²)的，5万维的向量要算好几秒
+# angle_array()逆序累加一次平方和，得到每个尾部的平方和，一遍就算出所有角坐标；from_polar()是它的逆运算
+print(format(Vector([1, 1]), 'h'))
+# <1.4142135623730951, 0.7853981633974483>
+print(format(Vector([1, 1, 1]), '.3eh'))
+# <1.732e+00, 9.553e-01, 7.854e-01>
+v = Vector([3, -4, 0.5, -1])
+print(all(math.isclose(a, v.angle(n)) for n, a in enumerate(v.angles(), 1)))  # 与逐个计算的结果一致
+# True
+w = Vector.from_polar(abs(v), v.angle_array())
+print(all(math.isclose(a, b) for a, b in zip(v, w)))
+# True
+
+
+"""11、向量集合的紧凑二进制格式"""
+# __bytes__为每个向量单独写一个typecode字节，传输几百万个向量就会产生几百万个小bytes对象和重复的头部
+# write_vectors把typecode相同的一批连续向量写成一帧：一个头部、所有向量的长度，以及连在一起的分量；float32=True时把'd'向下转换成'f'，体积减半（会损失精度）
+# read_vectors逐帧读取，分量与存储格式相同时，产出的Vector是该帧缓冲的视图，不再复制
+# 要把Vector发送给工作进程，可以使用pickle协议5：Vector.__reduce_ex__把分量包装成PickleBuffer，配合buffer_callback和buffers参数带外传输，数组不会被复制
+FRAME_HEADER = struct.Struct('<4scc2xI')  # 魔数、存储的typecode、原来的typecode、向量数量
+FRAME_MAGIC = b'VECF'
+
+
+def write_vectors(fp, vectors, float32=False, frame_size=65536):  # 返回写入的向量数量
+    total = 0
+    for typecode, run in itertools.groupby(vectors, key=lambda v: v.typecode):  # 每遇到不同的typecode就开始新的一帧
+        stored = 'f' if float32 and typecode == 'd' else typecode
+        while True:
+            frame = list(itertools.islice(run, frame_size))  # 限制每帧的向量数量，读写时只需缓冲一帧
+            if not frame:
+                break
+            lengths = array('I', (len(v) for v in frame))
+            fp.write(FRAME_HEADER.pack(FRAME_MAGIC, stored.encode(), typecode.encode(), len(frame)))
+            fp.write(lengths)
+            for v in frame:
+                fp.write(v.tobuffer() if stored == typecode else array(stored, v))
+            total += len(frame)
+    return total
+
+
+def read_vectors(fp, cls=Vector):  # 生成器，逐个产出向量
+    while True:
+        header = fp.read(FRAME_HEADER.size)
+        if not header:
+            return
+        magic, stored, typecode, count = FRAME_HEADER.unpack(header)
+        if magic != FRAME_MAGIC:
+            raise ValueError('bad frame header: {!r}'.format(header))
+        stored = stored.decode()
+        lengths = array('I')
+        lengths.fromfile(fp, count)
+        itemsize = array(stored).itemsize
+        data = memoryview(fp.read(sum(lengths) * itemsize)).cast(stored)  # 整帧的分量一次读入
+        offset = 0
+        for length in lengths:
+            yield cls.frombuffer(data[offset:offset + length])  # 存储格式与cls.typecode相同时不复制
+            offset += length
+
+
+# 测试
+import io
+
+vectors = [Vector(range(n)) for n in range(1, 1001)]
+stream = io.BytesIO()
+write_vectors(stream, vectors)
+print(len(stream.getvalue()))  # 一个12字节的头部，1000个4字节的长度，然后是500500个分量
+# 4008012
+stream.seek(0)
+print(list(read_vectors(stream)) == vectors)
+# True
+stream = io.BytesIO()
+write_vectors(stream, [Vector([0.1, 0.2]), Vector([1.5])], float32=True)
+stream.seek(0)
+print(len(stream.getvalue()), list(read_vectors(stream)))  # 0.1和0.2转换成float32后损失了精度
+# 32 [Vector([0.10000000149011612, 0.20000000298023224]), Vector([1.5])]
+
+v = Vector(range(100000))
+buffers = []
+data = pickle.dumps(v, protocol=5, buffer_callback=buffers.append)  # 分量不写入data，而是交给buffer_callback
+clone = pickle.loads(data, buffers=buffers)
+print(len(data), clone == v, clone.tobuffer().obj is v._components)  # 只有几十个字节，clone与v共享数组
+# 84 True True
+print(pickle.loads(pickle.dumps(v)) == v)  # 不提供buffer_callback时，分量照常写入pickle数据
+# True
+
+
+"""12、与顺序有关的散列值"""
+# 异或归约的散列值与分量顺序无关，Vector([1, 2])和Vector([2, 1])的散列值相同，用作字典的键或放入集合时会退化成O(n)的探测
+# 现在的__hash__对分量元组求散列值，并缓存在实例上。检查自定义__hash__的冲突情况，可以使用第3章的hash_report()
+print(hash(Vector([1, 2])) == hash(Vector([2, 1])), hash(Vector([0.0])) == hash(Vector([-0.0])))
+# False True
+print(len({Vector(p) for p in itertools.permutations(range(6))}))  # 720个排列都是不同的键
+# 720
+
+
+"""13、快速的等值测试和allclose"""
+# __eq__原来用all()和生成器表达式比较，每个分量都要装箱成float对象。两个操作数都是Vector时，改为比较两个memoryview：在C语言层面一次遍历缓冲，比生成器表达式快一个数量级
+# 不能直接比较原始字节（memcmp）：NaN的字节相同但不相等，0.0和-0.0的字节不同但相等；memoryview按格式比较值，正好符合浮点数的语义
+# allclose()判断两个向量是否近似相等，规则与math.isclose()相同
+nan = float('nan')
+print(Vector([1, 0.0]) == Vector([1, -0.0]), Vector([nan]) == Vector([nan]), Vector([1, 2]) == [1, 2])
+# True False True
+print(Vector([1, 2]).allclose(Vector([1, 2 + 1e-12])), Vector([1, 2]).allclose(Vector([1, 2.1]), abs_tol=0.2))
+# True True
+big = Vector(range(1000000))
+print(big == Vector.frombytes(bytes(big)), big.allclose(Vector(x + 1e-7 for x in range(1000000)), abs_tol=1e-6))
+# True True
+
+
+"""14、流式多元统计"""
+# 第7章的Averager把所有历史值存入列表，每次都重新求和。向量流也一样：保存所有向量再重新计算均值和方差，时间是O(n²)，内存随流的长度增长
+# VectorStats用Welford算法增量更新，状态只有三个array：计数、均值、各分量的偏差平方和（M2）；需要协方差时再加一个dim×dim的协同矩（内存是O(dim²)，仍然与流的长度无关）
+# update()接受Vector或VectorBatch：批量输入先算出这一批的统计量，再用Chan等人的并行公式合并，安装了NumPy时按整块矩阵计算
+# merge()用同一个公式合并另一个工作进程的累加器，结果与把两段数据依次输入同一个累加器在数学上相等
+import random
+
+
+class VectorStats:
+    """ 向量流的均值、方差和协方差 """
+
+    def __init__(self, dim, covariance=False):
+        self.dim = dim
+        self.count = 0
+        self._mean = array('d', [0]) * dim
+        self._m2 = array('d', [0]) * dim  # 各分量与均值之差的平方和
+        self._comoment = array('d', [0]) * (dim * dim) if covariance else None  # 按行存储的协同矩
+
+    def update(self, data):  # data是Vector、VectorBatch或由向量构成的可迭代对象
+        if isinstance(data, VectorBatch):
+            if data.dim is not None and data.dim != self.dim:
+                raise ValueError('expected vectors of dimension {}'.format(self.dim))
+            if numpy is not None:
+                self._merge_batch(data._matrix())
+                return self
+            data = iter(data)
+        elif isinstance(data, Vector):
+            data = [data]
+        for vector in data:
+            self._update_one(vector)
+        return self
+
+    def _update_one(self, vector):  # Welford算法：每个向量只遍历一次分量
+        if len(vector) != self.dim:
+            raise ValueError('expected a vector of dimension {}, got {}'.format(self.dim, len(vector)))
+        self.count += 1
+        mean, m2 = self._mean, self._m2
+        delta = [x - m for x, m in zip(vector, mean)]  # 与旧均值的差
+        for i, x in enumerate(vector):
+            mean[i] += delta[i] / self.count
+        delta2 = [x - m for x, m in zip(vector, mean)]  # 与新均值的差
+        for i in range(self.dim):
+            m2[i] += delta[i] * delta2[i]
+        if self._comoment is not None:
+            comoment, dim = self._comoment, self.dim
+            for i in range(dim):
+                d = delta[i]
+                for j in range(dim):
+                    comoment[i * dim + j] += d * delta2[j]
+
+    def _merge_moments(self, count, mean, m2, comoment):  # Chan等人的并行公式，参数都是array
+        total = self.count + count
+        if count == 0:
+            return
+        delta = [b - a for a, b in zip(self._mean, mean)]
+        factor = self.count * count / total
+        for i in range(self.dim):
+            self._mean[i] += delta[i] * count / total
+            self._m2[i] += m2[i] + delta[i] * delta[i] * factor
+        if self._comoment is not None:
+            dim = self.dim
+            for i in range(dim):
+                for j in range(dim):
+                    self._comoment[i * dim + j] += comoment[i * dim + j] + delta[i] * delta[j] * factor
+        self.count = total
+
+    def _merge_batch(self, m):  # 用NumPy一次算出整批的统计量，再合并
+        if len(m) == 0:
+            return
+        mean = m.mean(axis=0)
+        centered = m - mean
+        m2 = (centered * centered).sum(axis=0)
+        comoment = (centered.T @ centered).ravel() if self._comoment is not None else None
+        to_array = lambda a: array('d', a.tobytes()) if a is not None else None
+        self._merge_moments(len(m), to_array(mean), to_array(m2), to_array(comoment))
+
+    def merge(self, other):  # 合并另一个累加器，就地修改并返回self
+        if other.dim != self.dim or (other._comoment is None) != (self._comoment is None):
+            raise ValueError('accumulators are not compatible')
+        self._merge_moments(other.count, other._mean, other._m2, other._comoment)
+        return self
+
+    def mean(self):
+        return Vector(self._mean)
+
+    def variance(self, ddof=0):  # ddof=1时是样本方差
+        if self.count <= ddof:
+            raise ValueError('not enough data')
+        return Vector(x / (self.count - ddof) for x in self._m2)
+
+    def covariance(self, ddof=0):  # 返回VectorBatch，每一行是协方差矩阵的一行
+        if self._comoment is None:
+            raise ValueError('covariance was not enabled')
+        if self.count <= ddof:
+            raise ValueError('not enough data')
+        rows = VectorBatch(dim=self.dim)
+        rows._data.extend(x / (self.count - ddof) for x in self._comoment)
+        return rows
+
+
+# 测试：分批输入、逐个输入和合并，结果一致
+rnd = random.Random(7)
+stream = [Vector(rnd.gauss(i, i + 1) for i in range(3)) for _ in range(3000)]
+stats = VectorStats(3, covariance=True).update(VectorBatch(stream[:1000]))
+for v in stream[1000:2000]:
+    stats.update(v)
+worker = VectorStats(3, covariance=True).update(stream[2000:])  # 另一个工作进程的累加器
+stats.merge(worker)
+full = VectorStats(3, covariance=True).update(stream)
+print(stats.count, stats.mean().allclose(full.mean()), stats.variance(1).allclose(full.variance(1)))
+# 3000 True True
+print(all(a.allclose(b) for a, b in zip(stats.covariance(), full.covariance())))
+# True
+expected = [sum(v[i] for v in stream) / len(stream) for i in range(3)]
+print(stats.mean().allclose(Vector(expected)))
+# True
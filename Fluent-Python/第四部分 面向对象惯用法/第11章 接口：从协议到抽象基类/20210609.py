@@ -82,6 +82,7 @@ numbers包定义的是“数字塔”————各个抽象基类的层次结
 两个具体方法：
     loaded()：如果容器中至少有一个元素，返回True
     inspect()：返回一个有序元组，由容器中的现有元素构成，不会修改容器的内容（内部的顺序不保留）
+    snapshot()：返回由现有元素构成的只读集合或副本（如元组，支持len()和迭代），不修改容器；默认返回None，子类知道自己如何存储元素时应该覆盖它
 '''
 import abc
 
@@ -97,10 +98,20 @@ class Tombola(abc.ABC):  # 自己定义的抽象基类要继承abc.ABC
 
     def loaded(self):  # 抽象基类可以包含具体方法
         """ 如果至少有一个元素，返回True；否则返回False """
+        items = self.snapshot()
+        if items is not None:  # 有快照时不需要构建有序元组
+            return bool(items)
         return bool(self.inspect())  # 抽象基类中的具体方法只能依赖抽象基类定义的接口————只能使用抽象基类中的其他具体方法、抽象方法或特性
 
+    def snapshot(self):
+        """ 返回由当前元素构成的元组或只读集合，不修改容器，调用方也不能通过它修改容器；不支持时返回None """
+        return None
+
     def inspect(self):
         """ 返回一个有序元组，由当前元素构成 """
+        items = self.snapshot()
+        if items is not None:  # 子类提供了快照，不需要取出再放回，BingoCage也不用重新洗牌
+            return tuple(sorted(items))
         items = []
         while True:  # 不断调用pick()方法，把Tombola清空————不知道子类如何存储元素
             try:
@@ -140,15 +151,25 @@ class Tombola(object):  # Python2.0
 # BingoCage子类使用了更还的随即发生器，实现了所需的抽象方法load和pick，从Tombola中继承了loaded方法，覆盖了inspect方法，还增加了__call__方法
 import random
 
+
+# worker_rngs()为每个工作线程或进程创建独立的随机数流，同样的种子总是得到同样的一组流
+def worker_rngs(seed, workers):
+    return [random.Random('{}:{}'.format(seed, worker)) for worker in range(workers)]
+
+
 class BingoCage(Tombola):
-    def __init__(self, items):
-        self._randomizer = random.SystemRandom()  # 生成”适合用于加密“的随机字节序列
+    def __init__(self, items, rng=None):
+        # 默认使用可以设定种子的random.Random；需要”适合用于加密“的随机字节序列时传入random.SystemRandom()，但它每次取随机数都要调用操作系统
+        self._randomizer = rng if rng is not None else random.Random()
         self._items = []
         self.load(items)  # 委托load()方法实现初始加载
 
     def load(self, items):
-        self._items.extend(items)
-        self._randomizer.shuffle(self._items)  # 使用SystemRandom实例的shuffle()方法
+        balls, randbelow = self._items, self._randomizer.randrange
+        for item in items:  # 把每个新元素与随机位置上的元素交换，已有的元素不必重新洗牌，结果仍然是均匀的随机排列
+            balls.append(item)
+            position = randbelow(len(balls))
+            balls[position], balls[-1] = balls[-1], balls[position]
 
     def pick(self):
         try:
@@ -156,8 +177,24 @@ class BingoCage(Tombola):
         except IndexError:
             raise LookupError('pick from empty BingoCage')
 
+    def pick_many(self, n):  # 一次取出n个元素，顺序与连续调用n次pick()相同
+        if n > len(self._items):
+            raise LookupError('pick {} from BingoCage with {} items'.format(n, len(self._items)))
+        if n <= 0:
+            return []
+        picked = self._items[-n:]
+        del self._items[-n:]
+        picked.reverse()
+        return picked
+
     def __call__(self):
-        self.pick()  # bingo.pick()的快捷方式是bingo()
+        return self.pick()  # bingo.pick()的快捷方式是bingo()
+
+    def loaded(self):  # 不必为了判断是否为空而复制快照
+        return bool(self._items)
+
+    def snapshot(self):  # 返回元组，调用方无法通过它修改容器
+        return tuple(self._items)
 
 
 # LotteryBlower子类打乱”数字球“后没有取出最后一个，而是取出一个随机位置上的球
@@ -173,11 +210,16 @@ class LotteryBlower(Tombola):
             position = random.randrange(len(self._balls))  # 如果范围为空
         except ValueError:  # 捕获ValueError异常
             raise LookupError('pick from empty LotteryBlower')  # 兼容Tombola，捕获ValueError，抛出LookupError
-        return self._balls.pop(position)
+        balls = self._balls
+        balls[position], balls[-1] = balls[-1], balls[position]  # 与最后一个球交换后再弹出，pop()不需要移动其他元素，时间是O(1)
+        return balls.pop()
 
     def loaded(self):  # 覆盖loaded方法，避免调用inspect方法
         return bool(self._balls)  # 直接处理self._balls而不必构建整个有序元组，从而提升速度
 
+    def snapshot(self):
+        return tuple(self._balls)
+
     def inspect(self):  # 使用一行代码覆盖inspect方法
         return tuple(sorted(self._balls))
 
@@ -200,6 +242,9 @@ class TomboList(list):  # 扩展list，TomboList是list的真实子类
     def loaded(self):
         return bool(self)  # loaded方法委托bool函数
 
+    def snapshot(self):  # 虚拟子类不会继承Tombola的方法，需要自己实现
+        return tuple(self)
+
     def inspect(self):
         return tuple(sorted(self))
 
@@ -274,3 +319,569 @@ Traceback (most recent call last):
   ...
 TypeError: right operand in += must be 'AddableBingoCage' or an iterable
 '''
+
+
+"""5、Tombola子类的吞吐量"""
+# LotteryBlower.pick()原来调用self._balls.pop(position)，弹出随机位置的元素要把后面的元素都向前移动，是O(n)的操作
+# 现在先与最后一个元素交换再弹出，每次都是O(1)；元素的顺序本来就是随机的，交换不影响结果
+# TomboList继承自list，仍然使用pop(position)，可以用作对比
+# 默认的inspect()要清空容器再load()回去，BingoCage每次都要重新洗牌；有了snapshot()，inspect()只需要复制和排序，loaded()也不再构建有序元组
+import time
+
+
+def pick_all(tombola):
+    count = 0
+    while tombola.loaded():
+        tombola.pick()
+        count += 1
+    return count
+
+
+cage = BingoCage(range(10))
+before = list(cage._items)
+print(cage.inspect(), cage._items == before)  # inspect()不再打乱元素
+# (0, 1, 2, 3, 4, 5, 6, 7, 8, 9) True
+
+blower = LotteryBlower(range(10))
+picked = [blower.pick() for _ in range(4)]
+print(sorted(picked + list(blower.inspect())) == list(range(10)))
+# True
+
+for cls in (BingoCage, LotteryBlower, TomboList):
+    tombola = cls(range(100000))
+    start = time.perf_counter()
+    count = pick_all(tombola)
+    elapsed = time.perf_counter() - start
+    print('{:<14}{:>12,.0f} picks/s'.format(cls.__name__, count / elapsed))
+
+
+"""6、加权的Tombola"""
+# Tombola的子类都是等概率抽取。WeightedTombola中每个元素带有权重，被抽中的概率与权重成正比
+# pick()是不放回抽样：权重存放在树状数组（Fenwick树）中，从根部向下查找随机前缀和所在的位置，抽中后把权重置为0，查找和修改都是O(log n)
+# draw()是放回抽样：使用Vose的别名表，每次抽取只需要一个随机下标和一次比较，是O(1)；权重改变后，别名表在下一次draw()时以O(n)重建
+# load()与其他Tombola一样接受普通元素，权重为1；带权重的元素用load_weighted()载入。相同的元素载入多次就是多个独立的元素
+from array import array
+import collections
+import math
+
+
+class WeightedTombola(Tombola):
+    def __init__(self, items=(), rng=None):
+        self._randomizer = rng if rng is not None else random.Random()
+        self._items = []
+        self._weights = array('d')
+        self._tree = array('d', [0])  # 树状数组，下标从1开始
+        self._live = 0  # 权重大于0的元素个数，用它判断是否为空，不受浮点误差影响
+        self._alias = None  # 别名表，权重改变时置为None
+        self.load(items)
+
+    def load(self, items):  # 与Tombola的约定一致：每个元素的权重都是1
+        self.load_weighted((item, 1.0) for item in items)
+
+    def load_weighted(self, pairs):  # pairs由(元素, 权重)构成
+        items, weights = [], array('d')
+        for item, weight in pairs:
+            if not 0 <= weight < math.inf:  # 同时排除NaN和无穷大，它们会破坏树状数组中的所有和
+                raise ValueError('weight must be finite and non-negative: {!r}'.format(weight))
+            items.append(item)
+            weights.append(weight)
+        self._items.extend(items)
+        self._live += sum(1 for weight in weights if weight > 0)
+        if len(weights) > len(self._weights) // 8:  # 新元素较多时，O(n)重建整棵树更快
+            self._weights.extend(weights)
+            self._rebuild()
+        else:
+            for weight in weights:
+                self._append(weight)
+        self._alias = None
+
+    def _rebuild(self):
+        tree = array('d', [0])
+        tree.extend(self._weights)
+        size = len(tree)
+        for i in range(1, size):  # 每个节点把自己的和加到父节点上
+            parent = i + (i & -i)
+            if parent < size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _append(self, weight):  # 在末尾添加一个节点，O(log n)
+        self._weights.append(weight)
+        tree = self._tree
+        i = len(tree)
+        node, j, stop = weight, i - 1, i - (i & -i)
+        while j > stop:  # 新节点覆盖(i - lowbit(i), i]，加上其中已有节点的和
+            node += tree[j]
+            j -= j & -j
+        tree.append(node)
+
+    def _set(self, position, weight):
+        old = self._weights[position]
+        self._live += (weight > 0) - (old > 0)
+        self._weights[position] = weight
+        delta = weight - old
+        tree, i = self._tree, position + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+        if old > weight and old - weight > self._tree_total():  # 减去的权重比剩下的总和还大时，树中的舍入误差可能比剩下的权重还大，重建
+            self._rebuild()
+        self._alias = None
+
+    def _find(self, target):  # 返回前缀和首次超过target的下标
+        tree, position = self._tree, 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = position + step
+            if nxt < len(tree) and tree[nxt] <= target:
+                position = nxt
+                target -= tree[nxt]
+            step >>= 1
+        weights = self._weights
+        position = min(position, len(weights) - 1)
+        while position >= 0 and weights[position] <= 0:  # 浮点误差可能落到权重为0的位置上，向前找到最近的有效元素
+            position -= 1
+        if position < 0:
+            position = next(i for i, weight in enumerate(weights) if weight > 0)
+        return position
+
+    def _tree_total(self):  # 树状数组中所有权重之和，O(log n)
+        tree, i, total = self._tree, len(self._tree) - 1, 0.0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return math.fsum(self._weights)
+
+    def weight(self, position):  # position是元素载入的顺序号，从0开始
+        return self._weights[position]
+
+    def set_weight(self, position, weight):  # O(log n)，position可以是负数，从末尾开始计数
+        if not 0 <= weight < math.inf:
+            raise ValueError('weight must be finite and non-negative: {!r}'.format(weight))
+        self._set(range(len(self._weights))[position], weight)  # 规范化负数下标，越界时抛出IndexError
+
+    def pick(self):  # 不放回抽样
+        if not self._live:
+            raise LookupError('pick from empty WeightedTombola')
+        position = self._find(self._randomizer.random() * max(self._tree_total(), 0.0))
+        self._set(position, 0.0)
+        return self._items[position]
+
+    def draw(self):  # 放回抽样
+        if not self._live:
+            raise LookupError('draw from empty WeightedTombola')
+        if self._alias is None:
+            self._build_alias()
+        prob, alias = self._alias
+        rand = self._randomizer.random() * len(prob)
+        column = int(rand)
+        return self._items[column if rand - column < prob[column] else alias[column]]
+
+    def _build_alias(self):  # Vose的别名方法
+        n, total = len(self._weights), self.total()
+        prob, alias = array('d', [0]) * n, array('q', [0]) * n
+        scaled = [weight * n / total for weight in self._weights]
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less], alias[less] = scaled[less], more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        for i in small + large:  # 剩下的列由于浮点误差略小于或等于1
+            prob[i] = 1.0
+        self._alias = prob, alias
+
+    def loaded(self):
+        return self._live > 0
+
+    def snapshot(self):
+        return tuple(item for item, weight in zip(self._items, self._weights) if weight > 0)
+
+
+weighted = WeightedTombola(rng=random.Random(5))
+weighted.load_weighted([('gold', 1), ('silver', 3), ('bronze', 6)])
+counts = collections.Counter(weighted.draw() for _ in range(100000))
+print({item: round(count / 100000, 2) for item, count in sorted(counts.items())})
+# {'bronze': 0.6, 'gold': 0.1, 'silver': 0.3}
+print(weighted.inspect(), weighted.loaded())
+# ('bronze', 'gold', 'silver') True
+print(sorted([weighted.pick(), weighted.pick(), weighted.pick()]), weighted.loaded())  # 不放回抽样，每个元素只出现一次
+# ['bronze', 'gold', 'silver'] False
+weighted.load(['gold', 'gold', 'silver'])  # 普通元素，权重为1；重复的元素各自独立
+weighted.set_weight(3, 5)  # 第4个载入的元素，即第一个'gold'
+print(weighted.inspect(), collections.Counter(weighted.draw() for _ in range(70000)).most_common(1)[0][0])
+# ('gold', 'gold', 'silver') gold
+print(WeightedTombola([(1, 2), (1, 2, 3)]).inspect())  # 元组也是普通元素
+# ((1, 2), (1, 2, 3))
+weighted.set_weight(-1, 0)  # 负数下标从末尾开始计数
+print(weighted.inspect())
+# ('gold', 'gold')
+try:
+    weighted.set_weight(0, float('nan'))
+except ValueError as error:
+    print(error)
+# weight must be finite and non-negative: nan
+
+skewed = WeightedTombola(rng=random.Random(1))
+skewed.load_weighted([('big', 1e17), ('a', 1), ('b', 3), ('c', 0.5)])
+print(sorted(skewed.pick() for _ in range(4)), skewed.loaded())  # 减去巨大的权重后，剩下的元素仍然能抽到
+# ['a', 'b', 'big', 'c'] False
+rnd = random.Random(1)
+residue = WeightedTombola(rng=rnd)
+residue.load_weighted((i, rnd.random()) for i in range(1000))
+print(len({residue.pick() for _ in range(1000)}), residue.loaded())
+# 1000 False
+
+big_pool = WeightedTombola(rng=random.Random(1))
+big_pool.load_weighted((i, i % 10 + 1) for i in range(1000000))
+start = time.perf_counter()
+for _ in range(100000):
+    big_pool.draw()
+print('draw: {:,.0f}/s'.format(100000 / (time.perf_counter() - start)))
+start = time.perf_counter()
+for _ in range(100000):
+    big_pool.pick()
+print('pick: {:,.0f}/s'.format(100000 / (time.perf_counter() - start)))
+start = time.perf_counter()
+for i in range(10000):
+    big_pool.load([i])  # 逐个载入是O(log n)，不重建整棵树
+print('load: {:,.0f}/s'.format(10000 / (time.perf_counter() - start)))
+print(len(big_pool.inspect()))
+# 910000
+
+
+"""7、可以设定种子的BingoCage"""
+# BingoCage原来使用random.SystemRandom，每次洗牌都要从操作系统读取熵，而且每次load()都重新洗整个列表
+# 现在默认使用random.Random，可以传入设定了种子的实例来重现结果；load()只把新元素插入随机位置，代价与新元素的数量成正比
+rngs = worker_rngs(2021, 2)
+first = BingoCage(range(10), rng=rngs[0]).pick_many(10)
+print(first == BingoCage(range(10), rng=worker_rngs(2021, 2)[0]).pick_many(10), sorted(first) == list(range(10)))
+# True True
+print(first != BingoCage(range(10), rng=rngs[1]).pick_many(10))  # 不同工作线程的随机数流互不相同
+# True
+
+cage = BingoCage(range(1000), rng=random.Random(0))
+positions = collections.Counter()
+for _ in range(2000):  # 新载入的元素出现在各个位置的概率相同
+    small = BingoCage(range(4), rng=cage._randomizer)
+    small.load([99])
+    positions[small._items.index(99)] += 1
+print(sorted(positions), min(positions.values()) > 300)
+# [0, 1, 2, 3, 4] True
+
+for rng in (random.Random(0), random.SystemRandom()):
+    start = time.perf_counter()
+    for _ in range(200):
+        cage = BingoCage(range(1000), rng=rng)
+        cage.load(range(100))
+    print('{:<14}{:.3f}s'.format(type(rng).__name__, time.perf_counter() - start))
+
+
+"""8、多线程和asyncio共用的分片Tombola"""
+# 前面的Tombola子类都没有加锁，多个线程同时pick()可能取出同一个元素；用一把全局锁保护又会让所有线程排队
+# ShardedTombola把元素分散到N个分片中，每个分片有自己的锁。pick()从随机的分片开始，这个分片为空时依次从其他分片“偷”元素
+# 每个分片内部和LotteryBlower一样，与最后一个元素交换后弹出。每个线程使用自己的随机数发生器，避免共享状态
+# apick()是供asyncio协程使用的版本：分片的锁被占用时不阻塞事件循环，而是让出控制权后再试
+import asyncio
+import os
+import threading
+
+
+class ShardedTombola(Tombola):
+    def __init__(self, items=(), shards=None, seed=None):
+        count = shards if shards is not None else (os.cpu_count() or 1)
+        self._shards = [[] for _ in range(count)]
+        self._locks = [threading.Lock() for _ in range(count)]
+        self._seed = seed
+        self._local = threading.local()  # 每个线程的随机数发生器
+        self._next = 0  # load()下一次从哪个分片开始放
+        self._load_lock = threading.Lock()
+        self._streams = 0  # 已经创建的随机数流的个数
+        self.load(items)
+
+    def _rng(self):
+        rng = getattr(self._local, 'rng', None)
+        if rng is None:
+            with self._load_lock:
+                stream = self._streams
+                self._streams += 1
+            # 第k个使用这个实例的线程得到第k个随机数流；线程的先后顺序不确定，所以多线程时seed只保证各个流互不相同
+            seed = None if self._seed is None else '{}:{}'.format(self._seed, stream)
+            rng = self._local.rng = random.Random(seed)
+        return rng
+
+    def load(self, items):  # 轮流放入各个分片，使分片大小保持均衡
+        items = list(items)
+        with self._load_lock:
+            start, count = self._next, len(self._shards)
+            self._next = (start + len(items)) % count
+        for offset in range(count):
+            index = (start + offset) % count
+            with self._locks[index]:
+                self._shards[index].extend(items[offset::count])
+
+    @staticmethod
+    def _take(shard, rng):
+        position = rng.randrange(len(shard))
+        shard[position], shard[-1] = shard[-1], shard[position]
+        return shard.pop()
+
+    def pick(self):
+        rng = self._rng()
+        count = len(self._shards)
+        start = rng.randrange(count)
+        for offset in range(count):  # 从随机分片开始，为空时从其他分片偷取
+            index = (start + offset) % count
+            shard = self._shards[index]
+            if not shard:  # 不加锁先检查一次，跳过空分片
+                continue
+            with self._locks[index]:
+                if shard:
+                    return self._take(shard, rng)
+        raise LookupError('pick from empty ShardedTombola')
+
+    async def apick(self):
+        rng = self._rng()
+        count = len(self._shards)
+        start = rng.randrange(count)
+        while True:
+            contended = False
+            for offset in range(count):
+                index = (start + offset) % count
+                shard, lock = self._shards[index], self._locks[index]
+                if not shard:
+                    continue
+                if not lock.acquire(blocking=False):  # 锁被其他线程占用
+                    contended = True
+                    continue
+                try:
+                    if shard:
+                        return self._take(shard, rng)
+                finally:
+                    lock.release()
+            if not contended:
+                raise LookupError('pick from empty ShardedTombola')
+            await asyncio.sleep(0)  # 让出事件循环，稍后重试
+
+    def loaded(self):
+        return any(self._shards)
+
+    def snapshot(self):  # 逐个分片加锁复制
+        items = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                items.extend(shard)
+        return tuple(items)
+
+
+class LockedLotteryBlower(LotteryBlower):  # 对比用：一把全局锁保护整个LotteryBlower
+    def __init__(self, iterable):
+        super().__init__(iterable)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        with self._lock:
+            return super().pick()
+
+
+def consume(tombola, threads):  # 多个线程一起取空tombola，返回取出的全部元素和每秒取出的个数
+    results = [[] for _ in range(threads)]
+
+    def worker(out):
+        while True:
+            try:
+                out.append(tombola.pick())
+            except LookupError:
+                return
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in results]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return [item for out in results for item in out], elapsed
+
+
+picked, _ = consume(ShardedTombola(range(100000), shards=8), threads=4)
+print(len(picked), len(set(picked)) == 100000)  # 没有重复，也没有遗漏
+# 100000 True
+
+
+async def drain(tombola, consumers):
+    async def consumer():
+        items = []
+        while True:
+            try:
+                items.append(await tombola.apick())
+            except LookupError:
+                return items
+            await asyncio.sleep(0)
+    return [item for items in await asyncio.gather(*(consumer() for _ in range(consumers))) for item in items]
+
+
+picked = asyncio.run(drain(ShardedTombola(range(1000), shards=4), consumers=10))
+print(sorted(picked) == list(range(1000)))
+# True
+
+# 竞争测试：在有GIL的CPython中，纯Python代码同一时刻只有一个线程在运行，吞吐量不会随线程数线性增长；在自由线程的构建中分片才能体现出优势
+for threads in (1, 2, 4, 8):
+    for tombola in (LockedLotteryBlower(range(200000)), ShardedTombola(range(200000), shards=threads * 4)):
+        _, elapsed = consume(tombola, threads)
+        print('{} threads  {:<20}{:>12,.0f} picks/s'.format(threads, type(tombola).__name__, 200000 / elapsed))
+
+
+"""9、存放在磁盘上的Tombola"""
+# TomboList和BingoCage把所有元素放在列表中，每个元素要占用一个指针和一个int对象，几亿个ID放不进内存
+# DiskTombola把定宽整数存放在文件中，用mmap映射后通过memoryview按下标访问，内存中只有操作系统缓存的页面
+# 文件开头是16字节的头部：魔数、类型码和当前元素个数；元素个数之后的内容都视为无效
+# pick()先把随机位置上的元素与最后一个有效元素交换，再把元素个数减1写入头部。无论进程在哪一步崩溃，文件中的有效元素都是完整的
+# load()把新元素分块写到有效元素之后，全部写完后才更新元素个数；文件容量按倍数增长
+import mmap
+import struct
+
+
+class DiskTombola(Tombola):
+    HEADER = struct.Struct('<4sc3xQ')  # 魔数、类型码、元素个数
+    MAGIC = b'TMBL'
+    chunk_size = 65536  # load()每次写入的元素个数
+
+    def __init__(self, path, items=(), typecode='q', rng=None, durable=False):
+        self._randomizer = rng if rng is not None else random.Random()
+        self._durable = durable  # 为True时每次pick()都先把交换过的元素、再把头部刷新到磁盘，可以在断电后恢复，但速度慢得多
+        exists = os.path.exists(path) and os.path.getsize(path) >= self.HEADER.size
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            magic, code, self._size = self.HEADER.unpack(self._file.read(self.HEADER.size))
+            if magic != self.MAGIC:
+                raise ValueError('not a tombola file: {!r}'.format(path))
+            self.typecode = code.decode()
+        else:
+            self.typecode = typecode
+            self._size = 0
+            self._file.write(self.HEADER.pack(self.MAGIC, typecode.encode(), 0))
+            self._file.flush()
+        self._itemsize = array(self.typecode).itemsize
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._items = memoryview(self._map)[self.HEADER.size:].cast(self.typecode)
+        self.load(items)
+
+    def __len__(self):
+        return self._size
+
+    def _store_size(self, size):  # 刷新成功后才更新self._size
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self.typecode.encode(), size)
+        if self._durable:
+            try:
+                self._map.flush(0, min(mmap.ALLOCATIONGRANULARITY, len(self._map)))  # close()截断后，文件可能不到一页
+            except BaseException:
+                self.HEADER.pack_into(self._map, 0, self.MAGIC, self.typecode.encode(), self._size)  # 恢复原来的元素个数
+                raise
+        self._size = size
+
+    def _flush_item(self, position):  # 把position所在的页面刷新到磁盘，flush()的偏移量必须按ALLOCATIONGRANULARITY对齐
+        offset = self.HEADER.size + position * self._itemsize
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        self._map.flush(start, offset + self._itemsize - start)
+
+    def _reserve(self, capacity):  # 保证文件能容纳capacity个元素
+        if capacity <= len(self._items):
+            return
+        capacity = max(capacity, len(self._items) * 2, 1024)
+        self._items.release()  # 存在导出的缓冲区时mmap不能改变大小
+        try:
+            self._map.resize(self.HEADER.size + capacity * self._itemsize)
+        finally:  # 改变大小失败时也要重新建立视图，实例仍然可以使用
+            self._items = memoryview(self._map)[self.HEADER.size:].cast(self.typecode)
+
+    def load(self, items):
+        size = self._size
+        chunk = array(self.typecode)
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == self.chunk_size:
+                size = self._write(size, chunk)
+                chunk = array(self.typecode)
+        size = self._write(size, chunk)
+        if size != self._size:
+            if self._durable:
+                self._map.flush()
+            self._store_size(size)  # 数据全部写完后才提交新的元素个数
+
+    def _write(self, size, chunk):
+        self._reserve(size + len(chunk))
+        self._items[size:size + len(chunk)] = memoryview(chunk)
+        return size + len(chunk)
+
+    def pick(self):
+        size = self._size
+        if not size:
+            raise LookupError('pick from empty DiskTombola')
+        items, position = self._items, self._randomizer.randrange(size)
+        items[position], items[size - 1] = items[size - 1], items[position]
+        if self._durable:  # 交换的结果必须先于新的元素个数落盘，否则断电后取出的元素可能回到有效区域，而原来的末尾元素丢失
+            self._flush_item(position)
+            self._flush_item(size - 1)
+        self._store_size(size - 1)
+        return items[size - 1]
+
+    def loaded(self):
+        return self._size > 0
+
+    def snapshot(self):  # 返回有效元素的副本；返回mmap上的视图会让load()无法改变文件大小
+        items = array(self.typecode)
+        items.frombytes(self._items[:self._size].cast('B'))
+        return items
+
+    def close(self):
+        self._items.release()
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self.HEADER.size + self._size * self._itemsize)  # 去掉多余的容量
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+import tempfile
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'pool.bin')
+    with DiskTombola(path, range(1000000), rng=random.Random(7)) as pool:
+        first = [pool.pick() for _ in range(3)]
+        print(len(pool), os.path.getsize(path) >= 16 + 1000000 * 8)
+        # 999997 True
+    print(os.path.getsize(path))  # 关闭时去掉多余的容量
+    # 7999992
+    with DiskTombola(path) as pool:  # 重新打开后从上次的状态继续，不需要重新载入
+        rest = set(pool.snapshot())
+        print(len(pool), rest.isdisjoint(first), len(rest | set(first)))
+        # 999997 True 1000000
+        pool.load([-1, -2])
+        print(pool.inspect()[:3], len(pool))
+        # (-2, -1, 0) 999999
+        start = time.perf_counter()
+        for _ in range(100000):
+            pool.pick()
+        print('pick: {:,.0f}/s'.format(100000 / (time.perf_counter() - start)))
+        held = pool.snapshot()  # 持有快照时仍然可以载入和抽取
+        pool.load(range(5000))
+        print(len(pool) - len(held), pool.pick() is not None)
+        # 5000 True
+    with DiskTombola(os.path.join(tmp, 'durable.bin'), range(10), rng=random.Random(1), durable=True) as pool:
+        picked = pool.pick()
+    with DiskTombola(os.path.join(tmp, 'durable.bin')) as pool:
+        print(len(pool), picked not in pool.snapshot())
+        # 9 True
+    with DiskTombola(os.path.join(tmp, 'durable.bin'), durable=True) as pool:  # 截断后只有88字节的文件
+        print(os.path.getsize(os.path.join(tmp, 'durable.bin')), pool.pick() is not None, len(pool))
+        # 88 True 8
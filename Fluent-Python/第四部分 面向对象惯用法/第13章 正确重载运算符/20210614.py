@@ -106,11 +106,203 @@ import functools
 import operator
 import numbers
 import itertools
+import contextvars
+
+try:  # NumPy是可选依赖，没有安装时退回纯Python实现
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class PythonBackend:
+    """ 纯Python计算后端：用生成器表达式逐个处理array中的分量 """
+    name = 'python'
+    item_cost = 5e-8  # 归约时每个分量大约耗时多少秒，ParallelBackend据此判断是否值得并行
+
+    def add(self, a, b):  # 返回一个新数组，a是Vector实例，b可以是任何可迭代对象
+        pairs = itertools.zip_longest(a, b, fillvalue=0.0)
+        return array(a.typecode, (x + y for x, y in pairs))
+
+    def sub(self, a, b):
+        pairs = itertools.zip_longest(a, b, fillvalue=0.0)
+        return array(a.typecode, (x - y for x, y in pairs))
+
+    def mul(self, a, scalar):
+        return array(a.typecode, (x * scalar for x in a))
+
+    # 点积按从左到右的顺序逐个相加。Python 3.12起，浮点数的sum()改用补偿求和，与逐个相加的结果可能不同，所以这里不用sum()，
+    # NumPyBackend.dot用cumsum实现同样的顺序，两个后端的结果逐位相同
+    def matmul(self, a, b):
+        return functools.reduce(operator.add, map(operator.mul, a, b), 0.0)
+
+    def abs(self, a):
+        return math.sqrt(self.matmul(a, a))
+
+    def eq(self, a, b):
+        if isinstance(b, Vector):  # 比较两个memoryview，C语言层面一次遍历，语义与逐个使用==相同（NaN不等于NaN，0.0等于-0.0）
+            return len(a) == len(b) and memoryview(a._components) == memoryview(b._components)
+        return len(a) == len(b) and all(x == y for x, y in zip(a, b))
+
+    # 以下方法就地修改y或a的_components，供MutableVector使用，调用方要保证y不比x短
+    def iaxpy(self, alpha, x, y):  # y += alpha * x
+        components = y._components
+        for i, value in enumerate(x):
+            components[i] += alpha * value
+
+    def imul(self, a, scalar):
+        components = a._components
+        for i, value in enumerate(components):
+            components[i] = value * scalar
+
+    def itruediv(self, a, scalar):
+        components = a._components
+        for i, value in enumerate(components):
+            components[i] = value / scalar
+
+    # 以下方法处理惰性表达式的一个分块（见第9节），分块是typecode相同的array
+    def chunk(self, a, start, stop):
+        return a._components[start:stop]
+
+    def chunk_add(self, x, y):
+        return array(x.typecode, (a + b for a, b in itertools.zip_longest(x, y, fillvalue=0.0)))
+
+    def chunk_sub(self, x, y):
+        return array(x.typecode, (a - b for a, b in itertools.zip_longest(x, y, fillvalue=0.0)))
+
+    def chunk_mul(self, x, scalar):
+        return array(x.typecode, (a * scalar for a in x))
+
+    def chunk_neg(self, x):
+        return array(x.typecode, (-a for a in x))
+
+    def store(self, result, start, chunk):
+        result[start:start + len(chunk)] = chunk
+
+
+class NumPyBackend(PythonBackend):
+    """ NumPy计算后端：在_components上建立零复制的numpy.frombuffer视图，由ufunc一次处理整个向量 """
+    name = 'numpy'
+    item_cost = 3e-10
+
+    @staticmethod
+    def view(components):  # 视图与array共享同一块内存，不复制数据
+        return numpy.frombuffer(components, dtype=components.typecode)
+
+    @staticmethod
+    def accepts(a, b):  # 只有两个操作数都是typecode相同的Vector时才走NumPy路径，其他情况（如列表）交给超类处理
+        return isinstance(b, Vector) and a.typecode == b.typecode
+
+    @staticmethod
+    def dot(x, y):
+        n = min(len(x), len(y))
+        if n == 0:
+            return 0.0  # 与PythonBackend.matmul的起始值一致
+        products = numpy.multiply(x[:n], y[:n])
+        numpy.cumsum(products, out=products)  # cumsum按从左到右的顺序累加，舍入误差与PythonBackend.matmul逐个相加完全相同；numpy.dot的分块求和则会有细微差别
+        return float(products[-1]) + 0.0  # 加0.0与起始值0.0对齐，把-0.0变成0.0
+
+    @staticmethod
+    def padded(ufunc, x, y, out):  # 较长向量多出的分量与0.0运算，等同于zip_longest的fillvalue填充
+        n = min(len(x), len(y))
+        ufunc(x[:n], y[:n], out=out[:n])
+        if len(x) > n:
+            ufunc(x[n:], 0.0, out=out[n:])
+        else:
+            ufunc(0.0, y[n:], out=out[n:])
+
+    def add(self, a, b):
+        if not self.accepts(a, b):
+            return super().add(a, b)
+        result = array(a.typecode, [0]) * max(len(a), len(b))  # 预先分配结果数组，ufunc直接写入它的缓冲
+        self.padded(numpy.add, self.view(a._components), self.view(b._components), self.view(result))
+        return result
+
+    def sub(self, a, b):
+        if not self.accepts(a, b):
+            return super().sub(a, b)
+        result = array(a.typecode, [0]) * max(len(a), len(b))
+        self.padded(numpy.subtract, self.view(a._components), self.view(b._components), self.view(result))
+        return result
+
+    def mul(self, a, scalar):
+        result = array(a.typecode, [0]) * len(a)
+        numpy.multiply(self.view(a._components), float(scalar), out=self.view(result))
+        return result
+
+    def matmul(self, a, b):
+        if not self.accepts(a, b):
+            return super().matmul(a, b)
+        return self.dot(self.view(a._components), self.view(b._components))
+
+    def abs(self, a):
+        x = self.view(a._components)
+        return math.sqrt(self.dot(x, x))
+
+    def eq(self, a, b):
+        if not self.accepts(a, b):
+            return super().eq(a, b)
+        return len(a) == len(b) and bool((self.view(a._components) == self.view(b._components)).all())
+
+    block = 8192  # axpy每次处理的分量数，临时缓冲的大小固定，与向量长度无关
+
+    def iaxpy(self, alpha, x, y):
+        if not self.accepts(y, x):
+            return super().iaxpy(alpha, x, y)
+        xv = self.view(x._components)
+        out = self.view(y._components)[:len(xv)]
+        if alpha == 1:  # += 和 -= 不需要临时缓冲，1*x和-1*x都是精确的，结果与纯Python实现相同
+            numpy.add(out, xv, out=out)
+        elif alpha == -1:
+            numpy.subtract(out, xv, out=out)
+        else:
+            scratch = numpy.empty(min(self.block, len(xv)), dtype=xv.dtype)
+            for start in range(0, len(xv), self.block):
+                stop = start + self.block
+                chunk = scratch[:len(xv[start:stop])]
+                numpy.multiply(xv[start:stop], float(alpha), out=chunk)
+                numpy.add(out[start:stop], chunk, out=out[start:stop])
+
+    def imul(self, a, scalar):
+        view = self.view(a._components)
+        numpy.multiply(view, float(scalar), out=view)
+
+    def itruediv(self, a, scalar):
+        view = self.view(a._components)
+        numpy.true_divide(view, float(scalar), out=view)
+
+    def chunk(self, a, start, stop):  # 分块是_components的视图切片，不复制
+        return self.view(a._components)[start:stop]
+
+    def chunk_add(self, x, y):
+        out = numpy.empty(max(len(x), len(y)), dtype=x.dtype)
+        self.padded(numpy.add, x, y, out)
+        return out
+
+    def chunk_sub(self, x, y):
+        out = numpy.empty(max(len(x), len(y)), dtype=x.dtype)
+        self.padded(numpy.subtract, x, y, out)
+        return out
+
+    def chunk_mul(self, x, scalar):
+        return numpy.multiply(x, float(scalar))
+
+    def chunk_neg(self, x):
+        return numpy.negative(x)
+
+    def store(self, result, start, chunk):
+        self.view(result)[start:start + len(chunk)] = chunk
+
 
 class Vector:
     """ Vector类 """
     typecode = 'd'
     shortcut_names = 'xyzt'
+    backend = NumPyBackend() if numpy else PythonBackend()  # 类属性，所有运算都委托给它；可以赋值为PythonBackend()强制使用纯Python实现
+    _lazy_mode = contextvars.ContextVar('lazy', default=False)  # 为True时，+、-、*和一元-构建惰性表达式（见第9节）；每个线程和协程各自独立
+
+    @property
+    def _lazy(self):
+        return self._lazy_mode.get()
 
     def __init__(self, components):
         self._components = array(self.typecode, components)
@@ -129,32 +321,54 @@ class Vector:
     def __bytes__(self):
         return bytes([ord(self.typecode)]) + bytes(self._components)
 
-    def __hash__(self):
-        hashes = (hash(x) for x in self._components)
-        return functools.reduce(operator.xor, hashes, 0)
+    def __hash__(self):  # 与分量顺序有关，只计算一次，缓存在实例上
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(tuple(self._components))
+            return self._hash
 
     def __abs__(self):
-        return math.sqrt(sum(x * x for x in self))
+        return self.backend.abs(self)
 
     def __neg__(self):  # 计算 -v
+        if self._lazy:
+            return -VectorExpr.wrap(self)
         return Vector(-x for x in self)  # 构建一个新Vector实例，把self的每个分量都取反
 
     def __pos__(self):  # 计算 +v
         return Vector(self)  # 构建一个新Vector实例，传入self的各个分量
 
     def __add__(self, other):  # 运算符+
+        if self._lazy:
+            return VectorExpr.wrap(self) + other
         try:
-            pairs = itertools.zip_longest(self, other, fillvalue=0.0)  # pairs是个生成器，它会生成（a, b）形式的元组，其中a来自self，b来自other。如果self和other的长度不同，使用fillvalue填充较短的那个可迭代对象
-            return Vector(a + b for a, b in pairs)
+            return Vector(self.backend.add(self, other))  # 由后端计算各分量之和。纯Python后端使用zip_longest生成（a, b）形式的元组，如果self和other的长度不同，使用fillvalue填充较短的那个可迭代对象
         except TypeError:  # 捕获TypeError异常
             return NotImplemented  # 如果由于类型不兼容而导致运算符特殊方法无法返回有效的结果，那么应该返回NotImplemented，此时另一个操作数所属的类型还有机会执行运算，即Python会尝试调用反向方法
 
     def __radd__(self, other):  # __add__的反向版本
         return self + other  # 直接委托给 __add__ 方法
 
+    def __sub__(self, other):  # 运算符-，与+一样用0.0填充较短的向量
+        if self._lazy:
+            return VectorExpr.wrap(self) - other
+        try:
+            return Vector(self.backend.sub(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __rsub__(self, other):  # 减法不满足交换律，先把other转换成Vector
+        try:
+            return Vector(other) - self
+        except TypeError:
+            return NotImplemented
+
     def __mul__(self, other):  # 标量乘法
+        if self._lazy:
+            return VectorExpr.wrap(self) * other
         if isinstance(other, numbers.Real):  # 检查类型
-            return Vector(n * other for n in self)
+            return Vector(self.backend.mul(self, other))
         else:
             return NotImplemented  # 返回NotImplemented，尝试在other操作数上调用__rmul__方法
 
@@ -163,7 +377,7 @@ class Vector:
 
     def __matmul__(self, other):  # 点积运算符@
         try:
-            return sum(a * b for a, b in zip(self, other))
+            return self.backend.matmul(self, other)
         except TypeError:
             return NotImplemented
 
@@ -172,7 +386,7 @@ class Vector:
 
     def __eq__(self, other):  # 运算符==
         if isinstance(other, Vector):  # 如果other操作数是Vector实例，正常比较
-            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+            return self.backend.eq(self, other)
         else:
             return NotImplemented  # 否则返回NotImplemented
 
@@ -250,3 +464,577 @@ class Vector:
         typecode = chr(octets[0])
         memv = memoryview(octets[1:]).cast(typecode)
         return cls(memv)
+
+
+"""7、可插拔的计算后端"""
+''' 为什么需要后端
+上面的__add__、__mul__、__matmul__、__abs__和__eq__都用生成器表达式逐个处理分量，每个分量都要装箱成float对象，再执行一遍字节码。分量数量达到几万甚至上百万时，一次运算就要耗费数毫秒。
+Vector类把这些运算委托给backend类属性：
+* NumPyBackend
+    使用numpy.frombuffer在_components上建立视图，视图与array共享内存，不复制数据；ufunc的计算结果直接写入预先分配的array
+* PythonBackend
+    没有安装NumPy时使用，就是原来的纯Python实现
+
+两个后端的结果相同：长度不同的向量相加时，较短的向量仍然用0.0填充；点积和模按从左到右的顺序累加。只有两个操作数都是typecode相同的Vector时才走NumPy路径，与列表等其他可迭代对象运算时仍由纯Python实现处理
+'''
+print(Vector.backend.name)  # 安装了NumPy时输出numpy
+# numpy
+v1 = Vector([3, 4, 5, 6])
+v3 = Vector([1, 2])
+print(repr(v1 + v3))  # 仍然使用零填充较短的那个向量
+# Vector([4.0, 6.0, 5.0, 6.0])
+print(repr(11 * v3), v1 @ v1, abs(Vector([3, 4])), v1 == Vector([3, 4, 5, 6]))
+# Vector([11.0, 22.0]) 86.0 5.0 True
+print([10, 20, 30] @ Vector([5, 6, 7]))  # 另一个操作数不是Vector，由纯Python实现处理
+# 380.0
+
+# 与纯Python后端对比结果
+big1 = Vector(x / 7 for x in range(100000))
+big2 = Vector(x / 3 for x in range(99990))
+fast = (big1 + big2, big1 * 0.1, big1 @ big2, abs(big1), big1 == big2)
+Vector.backend = PythonBackend()  # 强制使用纯Python实现
+slow = (big1 + big2, big1 * 0.1, big1 @ big2, abs(big1), big1 == big2)
+Vector.backend = NumPyBackend() if numpy else PythonBackend()
+print(fast == slow)
+# True
+
+
+"""8、可变向量：就地修改的增量赋值运算符"""
+# Vector是不可变的，所以 v1 += v2 和 v1 *= 11 都会新建实例和数组（见第6节的id()示例）。在迭代求解的循环里，这些分配会占用大部分时间
+# MutableVector实现了__iadd__、__isub__、__imul__和__itruediv__，直接修改底层的array，然后返回self。计算同样委托给backend
+class MutableVector(Vector):
+    """ 可变的Vector类，增量赋值运算符就地修改分量 """
+    __hash__ = None  # 可变对象不可散列
+
+    def __setitem__(self, index, value):
+        self._components[index] = value
+
+    def _grow(self, size):  # 另一个操作数更长时，先用0.0把self补齐，与__add__的零填充一致
+        missing = size - len(self._components)
+        if missing > 0:
+            self._components.extend(array(self.typecode, [0]) * missing)
+
+    def axpy(self, alpha, x):  # 融合更新：self += alpha * x，只遍历一次，不创建中间向量
+        if not isinstance(x, Vector):
+            x = Vector(x)  # 其他可迭代对象先转换成Vector，如果x不可迭代，抛出TypeError
+        self._grow(len(x))
+        self.backend.iaxpy(alpha, x, self)
+        return self
+
+    def axpby(self, alpha, x, beta):  # 融合更新：self = alpha * x + beta * self
+        if x is self:  # 先缩放self会同时改变x，所以直接乘以alpha + beta
+            self.backend.imul(self, alpha + beta)
+            return self
+        if not isinstance(x, Vector):
+            x = Vector(x)  # 先转换和检查x，x不可迭代时抛出TypeError，self保持不变
+        self.backend.imul(self, beta)
+        return self.axpy(alpha, x)
+
+    def __iadd__(self, other):  # 运算符+=
+        try:
+            return self.axpy(1, other)
+        except TypeError:
+            return NotImplemented  # 返回NotImplemented，Python会退而调用__add__
+
+    def __isub__(self, other):  # 运算符-=
+        try:
+            return self.axpy(-1, other)
+        except TypeError:
+            return NotImplemented
+
+    def __imul__(self, other):  # 运算符*=
+        if isinstance(other, numbers.Real):
+            self.backend.imul(self, other)
+            return self
+        else:
+            return NotImplemented
+
+    def __itruediv__(self, other):  # 运算符/=
+        if isinstance(other, numbers.Real):
+            if other == 0:  # NumPy除以零只会发出警告，这里统一抛出ZeroDivisionError
+                raise ZeroDivisionError('division by zero')
+            self.backend.itruediv(self, other)
+            return self
+        else:
+            return NotImplemented
+
+    def __repr__(self):
+        return 'Mutable' + super().__repr__()
+
+
+# 测试：增量赋值不再创建新实例
+mv = MutableVector([1, 2, 3])
+mv_alias = mv
+mv += Vector([4, 5, 6])  # 与不可变的Vector一起使用
+print(repr(mv), mv is mv_alias)
+# MutableVector([5.0, 7.0, 9.0]) True
+mv *= 11
+mv /= 2
+mv -= [0.5, 0.5, 0.5]  # 右操作数可以是任何可迭代对象
+print(repr(mv), mv is mv_alias)
+# MutableVector([27.0, 38.0, 49.0]) True
+mv.axpy(2, Vector([1, 1, 1, 1]))  # 另一个向量更长时，先用0.0补齐
+print(repr(mv))
+# MutableVector([29.0, 40.0, 51.0, 2.0])
+print(repr(mv + Vector([1, 1])), mv == Vector([29, 40, 51, 2]))  # 普通运算符仍然返回新的Vector
+# Vector([30.0, 41.0, 51.0, 2.0]) True
+v = Vector([1, 2])
+v += mv  # 不可变的Vector与MutableVector相加，仍然得到新的Vector
+print(repr(v))
+# Vector([30.0, 42.0, 51.0, 2.0])
+mv = MutableVector([1, 2, 3])
+print(repr(mv.axpby(2, mv, 3)))  # x就是self
+# MutableVector([5.0, 10.0, 15.0])
+
+
+"""9、惰性求值：融合的表达式计算"""
+# 计算 a + b * 3 - c 时，每个运算符都会创建一个临时Vector，每个临时对象都要完整遍历一次分量，再分配一次内存
+# 在lazy()上下文中，Vector的运算符不立即计算，而是构建一棵小的表达式树（VectorExpr）。只有在迭代、索引、比较或序列化结果时才求值：
+# 求值时分块遍历所有操作数，每个分块沿着整棵树算完再处理下一块，中间结果只有一个分块那么大，能留在CPU缓存中；整个表达式只分配一次结果数组
+# 长度不同的向量仍然用0.0填充，每个节点的长度与立即求值时相同，所以结果与逐个运算符计算完全一样
+import contextlib
+
+
+@contextlib.contextmanager
+def lazy():  # 在with块中，Vector的运算符返回VectorExpr；只影响当前线程（或协程），其他线程中的运算仍然立即求值
+    token = Vector._lazy_mode.set(True)
+    try:
+        yield
+    finally:
+        Vector._lazy_mode.reset(token)
+
+
+class VectorExpr:
+    """ 惰性表达式树的节点，op是'leaf'、'add'、'sub'、'mul'或'neg' """
+    block = 4096  # 每个分块的分量数
+
+    def __init__(self, op, *operands):
+        self.op = op
+        self.operands = operands
+        self._value = None
+        if op in ('add', 'sub'):  # 与__add__一样，结果的长度取较长的操作数
+            self._len = max(len(operand) for operand in operands)
+        else:  # 叶节点的操作数是Vector，'mul'和'neg'的第一个操作数是子表达式
+            self._len = len(operands[0])
+
+    @classmethod
+    def wrap(cls, operand):  # 把Vector或其他可迭代对象包装成叶节点；如果operand不可迭代，抛出TypeError
+        if isinstance(operand, VectorExpr):
+            return operand
+        if isinstance(operand, MutableVector):  # 复制可变向量，之后的就地修改不会影响尚未求值的表达式
+            operand = Vector(operand._components)
+        elif not isinstance(operand, Vector):
+            operand = Vector(operand)
+        return cls('leaf', operand)
+
+    def _binary(self, op, left, right):
+        try:
+            return VectorExpr(op, VectorExpr.wrap(left), VectorExpr.wrap(right))
+        except TypeError:
+            return NotImplemented
+
+    def __add__(self, other):
+        return self._binary('add', self, other)
+
+    def __radd__(self, other):
+        return self._binary('add', other, self)
+
+    def __sub__(self, other):
+        return self._binary('sub', self, other)
+
+    def __rsub__(self, other):
+        return self._binary('sub', other, self)
+
+    def __mul__(self, other):
+        if isinstance(other, numbers.Real):
+            return VectorExpr('mul', self, other)
+        else:
+            return NotImplemented
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __neg__(self):
+        return VectorExpr('neg', self)
+
+    def __len__(self):  # 长度不需要求值
+        return self._len
+
+    def __repr__(self):
+        return '<VectorExpr {} len={}>'.format(self.op, self._len)
+
+    def _chunk(self, backend, start, stop):  # 计算[start, stop)这一块，节点比start:stop短时，返回的分块也更短
+        if self.op == 'leaf':
+            return backend.chunk(self.operands[0], start, stop)
+        elif self.op == 'mul':
+            return backend.chunk_mul(self.operands[0]._chunk(backend, start, stop), self.operands[1])
+        chunks = [operand._chunk(backend, start, stop) for operand in self.operands]
+        return getattr(backend, 'chunk_' + self.op)(*chunks)
+
+    def evaluate(self):  # 求值一次，然后缓存结果
+        if self._value is None:
+            backend = Vector.backend
+            result = array(Vector.typecode, [0]) * self._len
+            for start in range(0, self._len, self.block):
+                backend.store(result, start, self._chunk(backend, start, start + self.block))
+            value = Vector.__new__(Vector)  # 直接使用result，不再复制一次
+            value._components = result
+            self._value = value
+            self.op, self.operands = 'leaf', (value,)  # 释放对操作数的引用
+        return self._value
+
+    # 以下操作需要具体的分量，先求值，再委托给Vector
+    def __iter__(self):
+        return iter(self.evaluate())
+
+    def __getitem__(self, index):
+        return self.evaluate()[index]
+
+    def __eq__(self, other):
+        return self.evaluate() == other
+
+    def __hash__(self):
+        return hash(self.evaluate())
+
+    def __bytes__(self):
+        return bytes(self.evaluate())
+
+    def __str__(self):
+        return str(self.evaluate())
+
+    def __format__(self, format_spec=''):
+        return format(self.evaluate(), format_spec)
+
+    def __abs__(self):
+        return abs(self.evaluate())
+
+    def __bool__(self):
+        return bool(self.evaluate())
+
+    def __matmul__(self, other):
+        return self.evaluate() @ other
+
+    def __rmatmul__(self, other):
+        return other @ self.evaluate()
+
+
+# 测试
+a = Vector([1, 2, 3, 4])
+b = Vector([10, 20, 30])
+c = Vector([0.5, 0.5])
+with lazy():
+    expr = a + b * 3 - c  # 只构建表达式树，不计算
+print(repr(expr), len(expr))
+# <VectorExpr sub len=4> 4
+print(repr(expr.evaluate()), expr == a + b * 3 - c)  # 与立即求值的结果相同
+# Vector([30.5, 61.5, 93.0, 4.0]) True
+with lazy():
+    expr = -(big1 * 2 + big2) - [1, 2, 3]  # 也可以与列表运算
+print(expr[:3], bytes(expr) == bytes(-(big1 * 2 + big2) - [1, 2, 3]))
+# (-1.0, -2.619047619047619, -4.238095238095238) True
+mv = MutableVector([1, 2, 3])
+with lazy():
+    pending = mv + Vector([1, 1, 1])
+mv *= 10  # 表达式创建时复制了可变向量，之后的修改不影响结果
+print(list(pending))
+# [2.0, 3.0, 4.0]
+
+
+"""10、并行的分块归约"""
+# abs(v)、v @ w 和 v == w 都只用一个CPU核心。ParallelBackend把分量复制到共享内存（multiprocessing.shared_memory），按固定大小分块，交给ProcessPoolExecutor中的工作进程处理
+# 传给工作进程的只有共享内存块的名称和分块的范围，不会pickle分量数据。各块的部分和用math.fsum合并，fsum是精确舍入的补偿求和，结果与合并顺序无关
+# 分块大小固定，不依赖工作进程的数量，所以在任何机器上结果都一样（与串行的逐个相加相比，可能有最后一位的差别）
+# 向量长度小于threshold时，启动进程和复制数据的开销大于收益，直接交给基础后端串行计算
+# 不可变的Vector第一次参与并行计算时复制到共享内存，共享内存块缓存到向量被回收为止，之后的计算不再复制；MutableVector随时可能被修改，每次都要复制
+# 即使超过threshold，也要估算串行和并行的耗时：基础后端是NumPy时，串行的点积只比复制一遍数据稍慢，并行往往得不偿失
+from concurrent import futures
+from multiprocessing import shared_memory
+import os
+import weakref
+
+
+def reduce_chunk(op, names, typecode, start, stop):  # 在工作进程中运行，必须定义在模块顶层
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]  # 只是附加到主进程创建的共享内存上，由主进程负责释放
+    views = [block.buf.cast(typecode)[start:stop] for block in blocks]
+    try:
+        if op == 'eq':  # memoryview按struct格式逐个比较值，NaN不等于NaN，0.0等于-0.0，与==一致
+            return views[0] == views[1]
+        x, y = views[0], views[-1]  # 求平方和时只有一个共享内存块
+        if numpy is not None:
+            return float(numpy.dot(numpy.frombuffer(x, dtype=typecode), numpy.frombuffer(y, dtype=typecode)))
+        return math.fsum(map(operator.mul, x, y))
+    finally:
+        for view in views:  # 必须先释放所有视图，才能关闭共享内存
+            view.release()
+        for block in blocks:
+            block.close()
+
+
+class ParallelBackend:
+    """ 并行归约后端：大向量的abs、@和==在多个进程中分块计算，其他运算委托给基础后端 """
+    name = 'parallel'
+    copy_cost = 5e-10  # 复制一个字节到共享内存大约耗时多少秒
+    dispatch_cost = 2e-4  # 提交一个分块并取回结果的开销
+
+    def __init__(self, base=None, threshold=1_000_000, chunk_size=1 << 18, max_workers=None):
+        self.base = base or (NumPyBackend() if numpy else PythonBackend())
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self._executor = None  # 第一次需要时才创建进程池
+        self._segments = {}  # id(向量) -> (共享内存块, weakref.finalize对象)
+
+    def __getattr__(self, name):  # 没有覆盖的运算（加法、乘法、就地修改等）都交给基础后端
+        return getattr(self.base, name)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for key in list(self._segments):
+            self._segments[key][1]()  # 调用finalize对象，立即释放共享内存
+
+    @staticmethod
+    def _copy(vector):
+        raw = memoryview(vector._components).cast('B')
+        block = shared_memory.SharedMemory(create=True, size=max(raw.nbytes, 1))
+        block.buf[:raw.nbytes] = raw  # 一次内存复制，比pickle便宜得多
+        return block
+
+    @staticmethod
+    def _free(block):
+        block.close()
+        block.unlink()
+
+    def _release(self, key):  # 向量被回收或后端关闭时调用
+        self._free(self._segments.pop(key)[0])
+
+    def _cacheable(self, vector):
+        return not isinstance(vector, MutableVector)
+
+    def _shared(self, vector):  # 返回缓存的共享内存块
+        key = id(vector)
+        if key not in self._segments:
+            block = self._copy(vector)
+            self._segments[key] = block, weakref.finalize(vector, self._release, key)
+        return self._segments[key][0]
+
+    def _parallel(self, op, vectors, size):  # 分块提交给进程池
+        if self._executor is None:
+            self._executor = futures.ProcessPoolExecutor(self.max_workers)
+        typecode = vectors[0].typecode
+        temporary = []  # MutableVector的临时副本，计算完就释放
+        try:
+            names = []
+            for vector in vectors:
+                if self._cacheable(vector):
+                    names.append(self._shared(vector).name)
+                else:
+                    temporary.append(self._copy(vector))
+                    names.append(temporary[-1].name)
+            jobs = [self._executor.submit(reduce_chunk, op, names, typecode, start, min(start + self.chunk_size, size))
+                    for start in range(0, size, self.chunk_size)]
+            return [job.result() for job in jobs]  # 按分块顺序收集结果，与完成顺序无关
+        finally:
+            for block in temporary:
+                self._free(block)
+
+    def _worthwhile(self, vectors, size):  # 估算并行是否比基础后端串行更快
+        if size < self.threshold:
+            return False
+        serial = size * self.base.item_cost
+        copied = sum(len(v) * v._components.itemsize for v in vectors
+                     if not (self._cacheable(v) and id(v) in self._segments))
+        jobs = -(-size // self.chunk_size)
+        workers = self.max_workers or os.cpu_count() or 1
+        parallel = jobs * self.dispatch_cost + copied * self.copy_cost + serial / min(workers, jobs)
+        return parallel < serial
+
+    def _accepts(self, a, b):
+        return (isinstance(b, Vector) and a.typecode == b.typecode
+                and self._worthwhile([a, b], min(len(a), len(b))))
+
+    def matmul(self, a, b):
+        if not self._accepts(a, b):
+            return self.base.matmul(a, b)
+        return math.fsum(self._parallel('dot', [a, b], min(len(a), len(b))))
+
+    def abs(self, a):
+        if not self._worthwhile([a], len(a)):
+            return self.base.abs(a)
+        return math.sqrt(math.fsum(self._parallel('dot', [a], len(a))))
+
+    def eq(self, a, b):
+        if not self._accepts(a, b):
+            return self.base.eq(a, b)
+        return len(a) == len(b) and all(self._parallel('eq', [a, b], len(a)))
+
+
+if __name__ == '__main__':  # 使用spawn方式启动工作进程的平台会重新导入这个模块，所以把测试放在这里
+    import time
+    huge = Vector(x / 1000 for x in range(4_000_000))
+    huge2 = Vector(reversed(huge))
+    serial = (huge @ huge2, abs(huge), huge == huge2)
+    Vector.backend = ParallelBackend(base=PythonBackend(), max_workers=4)
+    t0 = time.perf_counter()
+    parallel = (huge @ huge2, abs(huge), huge == huge2)
+    print('parallel: {:.2f}s'.format(time.perf_counter() - t0))
+    print(all(math.isclose(x, y) for x, y in zip(serial, parallel)), parallel == (huge @ huge2, abs(huge), huge == huge2))  # 结果是确定的
+    # True True
+    t0 = time.perf_counter()
+    huge @ huge2  # 数据已经在共享内存中，不再复制
+    print('cached: {:.2f}s'.format(time.perf_counter() - t0))
+    print(len(Vector.backend._segments))
+    # 2
+    del huge2  # 向量被回收时释放它的共享内存
+    print(len(Vector.backend._segments))
+    # 1
+    Vector.backend.close()
+    if numpy is not None:
+        print(ParallelBackend(base=NumPyBackend())._worthwhile([huge], len(huge)))  # NumPy串行计算更快，不会并行
+        # False
+    Vector.backend = NumPyBackend() if numpy else PythonBackend()
+
+
+"""11、批量的top-k余弦相似度搜索"""
+# 把Vector当作嵌入向量，用 (q @ v) / (abs(q) * abs(v)) 在Python循环中给候选项打分，每一对都要重新计算两个模
+# SimilarityIndex在构建时把所有向量归一化，按行存储在一块连续的内存中。查询时先归一化整批查询向量，安装了NumPy时用一次矩阵乘法算出所有得分，再用argpartition选出top-k；
+# 没有NumPy时逐行计算点积，用heapq.nlargest保留top-k
+# workers大于1时，矩阵放在共享内存中，按行切分成分片，每个工作进程只处理自己的分片，返回分片内的top-k，最后在主进程中合并
+import heapq
+import random
+import time
+
+
+def normalized_rows(vectors, typecode='d'):  # 把向量归一化后连接成一个array，模为0的向量保持为0
+    rows = array(typecode)
+    for v in vectors:
+        norm = abs(v) or 1.0
+        rows.extend(x / norm for x in v)
+    return rows
+
+
+def topk_rows(matrix, dim, start, stop, queries, k):  # 在[start, stop)行中查找每个查询向量的top-k，返回[(得分, 行号), ...]的列表
+    if numpy is not None:
+        m = numpy.frombuffer(matrix, dtype=matrix.format, count=stop * dim).reshape(-1, dim)[start:]  # 只取用到的行
+        q = numpy.frombuffer(queries, dtype=queries.typecode).reshape(-1, dim)
+        scores = q @ m.T  # 一次矩阵乘法算出整批查询的得分
+        results = []
+        for row in scores:
+            top = numpy.argpartition(-row, k - 1)[:k] if k < len(row) else numpy.arange(len(row))
+            results.append(sorted(((float(row[i]), start + int(i)) for i in top), reverse=True))
+        return results
+    results = []
+    for n in range(len(queries) // dim):
+        q = queries[n * dim:(n + 1) * dim]
+        scores = ((sum(a * b for a, b in zip(q, matrix[i * dim:(i + 1) * dim])), i) for i in range(start, stop))
+        results.append(heapq.nlargest(k, scores))
+    return results
+
+
+def topk_shard(name, dim, start, stop, queries, k):  # 在工作进程中运行：附加到共享内存中的矩阵，只计算一个分片
+    block = shared_memory.SharedMemory(name=name)
+    whole = block.buf.cast('d')
+    matrix = whole[:stop * dim]  # 共享内存的大小可能按页向上取整（如macOS），末尾的多余部分不是矩阵的行
+    try:
+        return topk_rows(matrix, dim, start, stop, queries, k)
+    finally:
+        matrix.release()
+        whole.release()
+        block.close()
+
+
+class SimilarityIndex:
+    """ 预先归一化的向量矩阵，支持批量的top-k余弦相似度查询 """
+
+    def __init__(self, vectors, workers=1):
+        vectors = list(vectors)
+        self.dim = len(vectors[0]) if vectors else 0
+        if any(len(v) != self.dim for v in vectors):
+            raise ValueError('all vectors must have the same dimension')
+        self._len = len(vectors)
+        rows = normalized_rows(vectors)
+        self.workers = workers if self._len else 1  # 没有向量时不需要分片，也不创建进程池
+        if self.workers > 1:  # 把矩阵复制到共享内存，只复制这一次，之后每次查询只传送共享内存的名称和查询向量
+            raw = memoryview(rows).cast('B')
+            self._block = shared_memory.SharedMemory(create=True, size=max(raw.nbytes, 1))
+            self._block.buf[:raw.nbytes] = raw
+            self._executor = futures.ProcessPoolExecutor(workers)
+            size = -(-self._len // workers)  # 向上取整
+            self._shards = [(start, min(start + size, self._len)) for start in range(0, self._len, size)]
+        else:
+            self._matrix = memoryview(rows)
+
+    def __len__(self):
+        return self._len
+
+    def search(self, queries, k=10):  # queries是Vector的列表，返回每个查询的[(得分, 行号), ...]，得分由高到低
+        queries = list(queries)
+        for q in queries:
+            if len(q) != self.dim and self._len:  # 否则reshape会把一个错误维度的查询拆成多个查询
+                raise ValueError('expected queries of dimension {}, got {}'.format(self.dim, len(q)))
+        k = min(k, self._len)
+        if k == 0:
+            return [[] for _ in queries]
+        batch = normalized_rows(queries)
+        if self.workers <= 1:
+            return topk_rows(self._matrix, self.dim, 0, self._len, batch, k)
+        jobs = [self._executor.submit(topk_shard, self._block.name, self.dim, start, stop, batch, k)
+                for start, stop in self._shards]
+        shard_results = [job.result() for job in jobs]
+        return [heapq.nlargest(k, itertools.chain.from_iterable(per_query))  # 合并各分片的top-k
+                for per_query in zip(*shard_results)]
+
+    def close(self):  # 可以多次调用
+        if self.workers > 1 and self._block is not None:
+            self._executor.shutdown()
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):  # 用with语句保证共享内存被释放
+        self.close()
+
+
+def brute_force(queries, vectors, k=10):  # 对照组：在Python循环中逐对计算余弦相似度
+    results = []
+    for q in queries:
+        scores = (((q @ v) / (abs(q) * abs(v)), i) for i, v in enumerate(vectors) if abs(v))
+        results.append(heapq.nlargest(k, scores))
+    return results
+
+
+def benchmark(size=5000, dim=64, n_queries=20, k=10, workers=4):  # 对比召回率和延迟
+    rnd = random.Random(0)
+    vectors = [Vector(rnd.gauss(0, 1) for _ in range(dim)) for _ in range(size)]
+    queries = [Vector(rnd.gauss(0, 1) for _ in range(dim)) for _ in range(n_queries)]
+    t0 = time.perf_counter()
+    expected = brute_force(queries, vectors, k)
+    print('brute force: {:.3f}s'.format(time.perf_counter() - t0))
+    for n in (1, workers):
+        with SimilarityIndex(vectors, workers=n) as index:
+            t0 = time.perf_counter()
+            found = index.search(queries, k)
+            elapsed = time.perf_counter() - t0
+        recall = sum(len({i for _, i in a} & {i for _, i in b}) for a, b in zip(found, expected)) / (k * n_queries)
+        print('workers={}: {:.3f}s, recall={:.3f}'.format(n, elapsed, recall))
+
+
+# 测试
+index = SimilarityIndex([Vector([1, 0]), Vector([1, 1]), Vector([0, 3]), Vector([-1, 0])])
+print([[(round(score, 3), i) for score, i in hits] for hits in index.search([Vector([2, 0]), Vector([0, -1])], k=2)])
+# [[(1.0, 0), (0.707, 1)], [(0.0, 3), (0.0, 0)]]
+with SimilarityIndex([], workers=4) as empty:
+    print(len(empty), empty.search([Vector([1, 0])]))
+# 0 [[]]
+try:
+    index.search([Vector([1, 0, 0, 1])])
+except ValueError as error:
+    print(error)
+# expected queries of dimension 2, got 4
+
+if __name__ == '__main__':
+    benchmark()
@@ -80,13 +80,13 @@ class Vector2d:
         return outer_fmt.format(*components)  # 把格式化字符串代入外层格式
 
     def __hash__(self):  # 使向量变成可散列的
-        return hash(self.x) ^ hash(self.y)
+        return hash((self.x, self.y))  # 不用 hash(self.x) ^ hash(self.y)，异或与顺序无关，Vector2d(1, 2)和Vector2d(2, 1)会冲突
 
     # 从字节序列转换成Vector2d实例
     @classmethod
     def frombytes(cls, octets):  # 不用传入self参数，相反需要通过cls传入类本身
         typecode = chr(octets[0])  # 从第一个字节中读取typecode
-        memv = memoryview(octets[1:]).cast(typecode)  # 使用传入的octets字节序列创建一个memoryview
+        memv = memoryview(octets)[1:].cast(typecode)  # 使用传入的octets字节序列创建一个memoryview，先创建memoryview再切片，不会像octets[1:]那样复制字节序列，octets也可以是mmap等任何字节缓冲
         return cls(*memv)  # 拆包转换后的memoryview，得到构造方法所需的一对参数
 
 
@@ -222,3 +222,376 @@ print(Vector2d.typecode)  # Vector2d.typecode属性的值不变，只有v1实例
 # 另外一种更好的方法是：创建一个子类，类属性是公开的，因此会被子类继承
 class ShortVector2d(Vector2d):
     typecode = 'f'
+
+
+"""10、Vector2dArray：按列存储大量二维点"""
+# 每个Vector2d实例都有自己的__dict__，存储改写后的_Vector2d__x和_Vector2d__y，几千万个点会耗尽内存
+# Vector2dArray采用“数组结构”（structure of arrays）：x和y分别存储在两个array('d')中，每个点只占16个字节
+# 模、角度、加法和缩放都用map()调用内置函数，逐列处理，不创建Vector2d实例；索引得到的是Vector2dView视图，读取分量时才访问数组
+import itertools
+import numbers
+import operator
+import struct
+
+
+class Vector2dView(Vector2d):
+    """ Vector2dArray中某个点的视图，不复制分量 """
+
+    def __init__(self, owner, index):  # 不调用超类的构造方法，只记住所属的数组和索引
+        self._owner = owner
+        self._index = index
+
+    @property
+    def x(self):
+        return self._owner._xs[self._index]
+
+    @property
+    def y(self):
+        return self._owner._ys[self._index]
+
+    def __repr__(self):  # 与Vector2d的表示形式相同，eval(repr(view))得到Vector2d实例
+        return 'Vector2d({!r}, {!r})'.format(*self)
+
+
+class Vector2dArray:
+    """ 按列存储的二维向量数组 """
+    typecode = 'd'
+    header = struct.Struct('<cxxxxxxxQ')  # typecode和点的数量，填充到8字节对齐
+
+    def __init__(self, points=()):  # points是Vector2d实例或(x, y)对构成的可迭代对象
+        self._xs = array(self.typecode)
+        self._ys = array(self.typecode)
+        for x, y in points:
+            self._xs.append(x)
+            self._ys.append(y)
+
+    @classmethod
+    def fromcolumns(cls, xs, ys):
+        points = cls()
+        points._xs.extend(xs)
+        points._ys.extend(ys)
+        if len(points._xs) != len(points._ys):
+            raise ValueError('columns must have the same length')
+        return points
+
+    def append(self, point):
+        x, y = point
+        self._xs.append(x)
+        self._ys.append(y)
+
+    def __len__(self):
+        return len(self._xs)
+
+    def __iter__(self):
+        return (Vector2dView(self, i) for i in range(len(self)))
+
+    def __getitem__(self, index):
+        cls = type(self)
+        if isinstance(index, slice):  # 切片复制两列中对应的部分
+            return cls.fromcolumns(self._xs[index], self._ys[index])
+        elif isinstance(index, numbers.Integral):
+            return Vector2dView(self, range(len(self))[index])  # 处理负数索引，越界时抛出IndexError
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    def __repr__(self):
+        return '{}(<{} points>)'.format(type(self).__name__, len(self))
+
+    def __eq__(self, other):
+        if isinstance(other, Vector2dArray):
+            return self._xs == other._xs and self._ys == other._ys
+        return NotImplemented
+
+    def abs(self):  # 所有点的模，返回array
+        return array(self.typecode, map(math.hypot, self._xs, self._ys))
+
+    def angles(self):  # 所有点的角度，与Vector2d.angle()的计算方式相同
+        return array(self.typecode, map(math.atan2, self._xs, self._ys))
+
+    def __add__(self, other):  # 与等长的Vector2dArray逐点相加，或者所有点都加上同一个Vector2d
+        cls = type(self)
+        if isinstance(other, Vector2dArray):
+            if len(other) != len(self):
+                raise ValueError('arrays must have the same length')
+            other_xs, other_ys = other._xs, other._ys
+        elif isinstance(other, Vector2d):
+            other_xs, other_ys = itertools.repeat(other.x), itertools.repeat(other.y)
+        else:
+            return NotImplemented
+        return cls.fromcolumns(map(operator.add, self._xs, other_xs), map(operator.add, self._ys, other_ys))
+
+    def __radd__(self, other):
+        return self + other
+
+    def __mul__(self, other):  # 所有点乘以同一个标量
+        if isinstance(other, numbers.Real):
+            factor = itertools.repeat(other)
+            return type(self).fromcolumns(map(operator.mul, self._xs, factor), map(operator.mul, self._ys, factor))
+        else:
+            return NotImplemented
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __format__(self, format_spec=''):  # 逐点套用Vector2d的格式，'p'后缀表示极坐标，模和角度按列一次算出
+        if format_spec.endswith('p'):
+            format_spec = format_spec[:-1]
+            coords, outer_fmt = zip(self.abs(), self.angles()), '<{}, {}>'
+        else:
+            coords, outer_fmt = zip(self._xs, self._ys), '({}, {})'
+        points = (outer_fmt.format(format(a, format_spec), format(b, format_spec)) for a, b in coords)
+        return '[{}]'.format(', '.join(points))
+
+    def __bytes__(self):  # 头部之后是整列x和整列y，每列一次写出
+        return self.header.pack(self.typecode.encode(), len(self)) + bytes(self._xs) + bytes(self._ys)
+
+    tobytes = __bytes__
+
+    @classmethod
+    def frombytes(cls, octets):  # 每列一次读入，不逐点解析
+        memv = memoryview(octets).cast('B')
+        typecode, count = cls.header.unpack(memv[:cls.header.size])
+        typecode = typecode.decode()
+        size = count * array(typecode).itemsize
+        columns = []
+        for start in (cls.header.size, cls.header.size + size):
+            column = array(typecode)
+            column.frombytes(memv[start:start + size])
+            columns.append(column if typecode == cls.typecode else array(cls.typecode, column))
+        return cls.fromcolumns(*columns)
+
+
+# 测试
+points = Vector2dArray([Vector2d(3, 4), (1, 1), Vector2d(0, 2)])
+print(points, points.abs())
+# Vector2dArray(<3 points>) array('d', [5.0, 1.4142135623730951, 2.0])
+print(points[0], repr(points[-1]), points[0] == Vector2d(3, 4), abs(points[1]) == abs(Vector2d(1, 1)))  # 视图支持Vector2d的所有操作
+# (3.0, 4.0) Vector2d(0.0, 2.0) True True
+print(format(points * 2 + Vector2d(1, 1), '.1f'))
+# [(7.0, 9.0), (3.0, 3.0), (1.0, 5.0)]
+print(format(points[:2], '.3fp'))
+# [<5.000, 0.644>, <1.414, 0.785>]
+octets = bytes(points)
+print(len(octets), Vector2dArray.frombytes(octets) == points)
+# 64 True
+
+
+"""11、空间索引：网格散列和k-d树"""
+# 查找某个点附近的点，最直接的办法是线性扫描，对每个点都计算一次距离，是O(N)的。这里提供两种空间索引，接口相同：
+# * GridIndex：把平面划分成边长为cell_size的正方形格子，用字典把格子坐标映射到点的列表，支持动态插入和删除
+# * KDTree：一次性构建的隐式k-d树，点按中位数递归划分后存入两个array，不创建节点对象，适合静态的点集
+# 查询方法：within(center, radius)半径查询，nearest(center, k)返回k个最近邻（由近到远），in_box(xmin, ymin, xmax, ymax)矩形查询
+import collections
+import heapq
+
+
+class GridIndex:
+    """ 均匀网格散列，支持动态插入和删除 """
+
+    def __init__(self, cell_size, points=()):
+        self.cell_size = cell_size
+        self._cells = collections.defaultdict(list)  # 格子坐标 -> 点的列表
+        self._len = 0
+        self._bounds = None  # 包含所有非空格子的矩形(x0, y0, x1, y1)，删除点时不收缩，仍然包含所有非空格子
+        for point in points:
+            self.insert(point)
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, point):
+        key = self._cell(point.x, point.y)
+        self._cells[key].append(point)
+        self._len += 1
+        if self._bounds is None:
+            self._bounds = key + key
+        else:
+            x0, y0, x1, y1 = self._bounds
+            self._bounds = min(x0, key[0]), min(y0, key[1]), max(x1, key[0]), max(y1, key[1])
+
+    def remove(self, point):  # 删除一个与point相等的点，没有时抛出ValueError
+        key = self._cell(point.x, point.y)
+        cell = self._cells.get(key, [])
+        cell.remove(point)
+        if not cell:
+            del self._cells[key]
+        self._len -= 1
+        if not self._len:
+            self._bounds = None
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, point):
+        return point in self._cells.get(self._cell(point.x, point.y), ())
+
+    def _ring(self, cx, cy, r):  # 与(cx, cy)的切比雪夫距离正好为r的那一圈格子中的点
+        if r == 0:
+            yield from self._cells.get((cx, cy), ())
+            return
+        for i in range(-r, r + 1):
+            for key in ((cx + i, cy - r), (cx + i, cy + r)):
+                yield from self._cells.get(key, ())
+        for j in range(-r + 1, r):
+            for key in ((cx - r, cy + j), (cx + r, cy + j)):
+                yield from self._cells.get(key, ())
+
+    def in_box(self, xmin, ymin, xmax, ymax):
+        (cx0, cy0), (cx1, cy1) = self._cell(xmin, ymin), self._cell(xmax, ymax)
+        found = []
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):  # 矩形覆盖的格子比非空格子还多时，直接遍历非空格子
+            keys = [key for key in self._cells if cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1]
+        else:
+            keys = [(i, j) for i in range(cx0, cx1 + 1) for j in range(cy0, cy1 + 1)]
+        for key in keys:
+            found.extend(p for p in self._cells.get(key, ()) if xmin <= p.x <= xmax and ymin <= p.y <= ymax)
+        return found
+
+    def within(self, center, radius):
+        cx, cy = center
+        return [p for p in self.in_box(cx - radius, cy - radius, cx + radius, cy + radius)
+                if math.hypot(p.x - cx, p.y - cy) <= radius]
+
+    def nearest(self, center, k=1):  # 由内向外逐圈搜索格子
+        if k <= 0 or not self._len:
+            return []
+        cx, cy = center
+        cell_x, cell_y = self._cell(cx, cy)
+        x0, y0, x1, y1 = self._bounds
+        first = max(0, x0 - cell_x, cell_x - x1, y0 - cell_y, cell_y - y1)  # 更内侧的圈都在非空格子的范围之外
+        last = max(abs(cell_x - x0), abs(cell_x - x1), abs(cell_y - y0), abs(cell_y - y1))  # 更外侧的圈也是
+        if (2 * last + 1) ** 2 - max(2 * first - 1, 0) ** 2 > 4 * len(self._cells):
+            return self._nearest_by_cells(cx, cy, k)  # 查询点离数据很远或数据很分散时，逐圈搜索要查看大量空格子
+        heap = []  # 最大堆（距离取负），保存目前最近的k个点
+        seen = 0
+        for r in range(first, last + 1):
+            for p in self._ring(cell_x, cell_y, r):
+                seen += 1
+                item = (-math.hypot(p.x - cx, p.y - cy), seen, p)  # seen用于打破平局，避免比较Vector2d
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+            # 第r圈之外的点，距离至少是r个格子边长
+            if len(heap) == k and -heap[0][0] <= r * self.cell_size:
+                break
+        return [p for _, _, p in sorted(heap, reverse=True)]
+
+    def _nearest_by_cells(self, cx, cy, k):  # 按查询点到格子的最短距离排序非空格子，依次搜索，直到剩下的格子都比第k近的点远
+        size = self.cell_size
+        gaps = []
+        for i, j in self._cells:
+            dx = max(i * size - cx, 0, cx - (i + 1) * size)
+            dy = max(j * size - cy, 0, cy - (j + 1) * size)
+            gaps.append((math.hypot(dx, dy), i, j))
+        gaps.sort()
+        heap = []
+        seen = 0
+        for gap, i, j in gaps:
+            if len(heap) == k and gap > -heap[0][0]:
+                break
+            for p in self._cells[i, j]:
+                seen += 1
+                item = (-math.hypot(p.x - cx, p.y - cy), seen, p)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        return [p for _, _, p in sorted(heap, reverse=True)]
+
+
+class KDTree:
+    """ 隐式k-d树：区间[lo, hi)的中位数位于mid = (lo + hi) // 2，左右子树分别是[lo, mid)和[mid+1, hi) """
+
+    def __init__(self, points):
+        points = list(points)
+        self._build(points, 0, len(points), 0)
+        self._points = points  # 重新排列后的点
+        self._xs = array('d', (p.x for p in points))
+        self._ys = array('d', (p.y for p in points))
+
+    def _build(self, points, lo, hi, depth):  # 就地排列points，深度为偶数时按x划分，奇数时按y划分
+        if hi - lo <= 1:
+            return
+        key = operator.attrgetter('x' if depth % 2 == 0 else 'y')
+        points[lo:hi] = sorted(points[lo:hi], key=key)
+        mid = (lo + hi) // 2
+        self._build(points, lo, mid, depth + 1)
+        self._build(points, mid + 1, hi, depth + 1)
+
+    def __len__(self):
+        return len(self._points)
+
+    def in_box(self, xmin, ymin, xmax, ymax):
+        found = []
+        xs, ys = self._xs, self._ys
+        stack = [(0, len(self._points), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            x, y = xs[mid], ys[mid]
+            if xmin <= x <= xmax and ymin <= y <= ymax:
+                found.append(self._points[mid])
+            split, low, high = (x, xmin, xmax) if depth % 2 == 0 else (y, ymin, ymax)
+            if low <= split:  # 矩形与左半边相交
+                stack.append((lo, mid, depth + 1))
+            if high >= split:
+                stack.append((mid + 1, hi, depth + 1))
+        return found
+
+    def within(self, center, radius):
+        cx, cy = center
+        return [p for p in self.in_box(cx - radius, cy - radius, cx + radius, cy + radius)
+                if math.hypot(p.x - cx, p.y - cy) <= radius]
+
+    def nearest(self, center, k=1):
+        if k <= 0:
+            return []
+        cx, cy = center
+        xs, ys = self._xs, self._ys
+        heap = []  # 最大堆（距离取负），元素是(-距离, 索引)
+
+        def search(lo, hi, depth):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            item = (-math.hypot(xs[mid] - cx, ys[mid] - cy), mid)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            diff = (cx - xs[mid]) if depth % 2 == 0 else (cy - ys[mid])
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            search(*near, depth + 1)  # 先搜索查询点所在的一侧
+            if len(heap) < k or abs(diff) <= -heap[0][0]:  # 分割线比第k近的点还远时，剪掉另一侧
+                search(*far, depth + 1)
+
+        search(0, len(self._points), 0)
+        return [self._points[i] for _, i in sorted(heap, reverse=True)]
+
+
+# 测试：与线性扫描对比
+import random
+
+rnd = random.Random(42)
+cloud = [Vector2d(rnd.uniform(0, 100), rnd.uniform(0, 100)) for _ in range(20000)]
+grid = GridIndex(2.0, cloud)
+tree = KDTree(cloud)
+center = Vector2d(50, 50)
+dist = lambda p: math.hypot(p.x - center.x, p.y - center.y)
+brute = sorted(cloud, key=dist)
+print(grid.nearest(center, 5) == tree.nearest(center, 5) == brute[:5])
+# True
+print(sorted(grid.within(center, 3), key=dist) == sorted(tree.within(center, 3), key=dist) == [p for p in brute if dist(p) <= 3])
+# True
+print(len(grid.in_box(10, 10, 20, 20)) == len(tree.in_box(10, 10, 20, 20)) == sum(10 <= p.x <= 20 and 10 <= p.y <= 20 for p in cloud))
+# True
+grid.remove(brute[0])  # 网格散列支持删除
+print(brute[0] in grid, grid.nearest(center)[0] == brute[1], len(grid))
+# False True 19999
+far = Vector2d(2000, 2000)  # 远离数据的查询点不再逐圈扫描大量空格子
+print(grid.nearest(far, 3) == tree.nearest(far, 3), grid.nearest(center, 0), tree.nearest(center, 0))
+# True [] []